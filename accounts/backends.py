@@ -0,0 +1,16 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+
+from .identity import get_user
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose per-request user lookup comes from the identity cache."""
+
+    def get_user(self, user_id):
+        user = get_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # ModelBackend.aget_user would go straight to the database.
+        return await sync_to_async(self.get_user)(user_id)
@@ -0,0 +1,44 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from budgetmanage.caching import cached_for_user
+
+IDENTITY_TIMEOUT = 60 * 15
+
+
+def _fields(instance, exclude=()):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields if field.attname not in exclude
+    }
+
+
+def _build(model, fields):
+    return model.from_db(DEFAULT_DB_ALIAS, list(fields), list(fields.values()))
+
+
+def _load(user_id):
+    from .models import User
+
+    user = User.objects.select_related('profile').filter(pk=user_id).first()
+    if user is None:
+        return None
+    profile = getattr(user, 'profile', None)
+    # The password hash stays out of the cache; sessions only need its HMAC.
+    return _fields(user, exclude=('password',)), user.get_session_auth_hash(), _fields(profile) if profile else None
+
+
+def get_user(user_id):
+    """Load a user with its profile attached, from the cache or with a single query."""
+    from .models import User, UserProfile
+
+    cached = cached_for_user(user_id, 'identity:v2', lambda: _load(user_id), IDENTITY_TIMEOUT)
+    if cached is None:
+        return None
+    user_fields, session_auth_hash, profile_fields = cached
+    user = _build(User, user_fields)
+    user._session_auth_hash = session_auth_hash
+    if profile_fields is not None:
+        profile = _build(UserProfile, profile_fields)
+        user._state.fields_cache['profile'] = profile
+        profile._state.fields_cache['user'] = user
+    return user
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_achievement_userprofile_useractivity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useractivity',
+            name='friends',
+            field=models.ManyToManyField(blank=True, to='accounts.useractivity'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_useractivity_friends'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='categories_used',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_logs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
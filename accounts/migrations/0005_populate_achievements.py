@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# A frozen copy of Achievement.populate_achievements(), so this migration keeps
+# seeding the same rows however the live model changes.
+ACHIEVEMENTS = [
+    ('FIRST_LOG', "First Drop in the Bucket", "You've logged your very first expense!", "fa-solid fa-tint"),
+    ('THREE_DAY_STREAK', "Getting Started", "Logged expenses for 3 days in a row. Consistency is key!", "fa-solid fa-seedling"),
+    ('SEVEN_DAY_STREAK', "Weekly Warrior", "Maintained a 7-day logging streak. You're building a great habit!", "fa-solid fa-calendar-week"),
+    ('THIRTY_DAY_STREAK', "Monthly Master", "Kept a logging streak for a full 30 days. Your finances are in great hands!", "fa-solid fa-crown"),
+    ('TENTH_LOG', "Diligent Logger", "Logged a total of 10 expenses.", "fa-solid fa-list-ol"),
+    ('FIFTIETH_LOG', "Super Scrivener", "Logged a total of 50 expenses. Look at all that data!", "fa-solid fa-file-invoice-dollar"),
+    ('GOAL_SETTER', "Dreamer", "Set your first monthly savings goal. Aim high!", "fa-solid fa-bullseye"),
+    ('GOAL_ACHIEVER', "Goal Getter!", "Successfully met a monthly savings goal. You did it!", "fa-solid fa-trophy"),
+    ('CATEGORY_EXPLORER', "Organizer", "Used 5 different expense categories. Nicely sorted!", "fa-solid fa-tags"),
+]
+
+
+def populate_achievements(apps, schema_editor):
+    # The evaluator caches the catalog per process and expects every key to
+    # exist, so seed it with the schema.
+    Achievement = apps.get_model('accounts', 'Achievement')
+    for key, name, description, icon in ACHIEVEMENTS:
+        Achievement.objects.update_or_create(
+            key=key, defaults={'name': name, 'description': description, 'icon': icon},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_userprofile_achievement_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_achievements, migrations.RunPython.noop),
+    ]
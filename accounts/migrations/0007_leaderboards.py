@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:42
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BOARDS = {'streak': 'streak_count', 'logs': 'total_logs', 'goals': 'goals_met'}
+
+
+def fill_leaderboards(apps, schema_editor):
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    MonthlyStatement = apps.get_model('budgetmanage', 'MonthlyStatement')
+    LeaderboardBucket = apps.get_model('accounts', 'LeaderboardBucket')
+    met = MonthlyStatement.objects.filter(goal_met=True).values_list('user_id').annotate(n=Count('id')).order_by()
+    for user_id, goals_met in met:
+        UserProfile.objects.filter(user_id=user_id).update(goals_met=goals_met)
+    LeaderboardBucket.objects.bulk_create([
+        LeaderboardBucket(board=board, score=score, users=users)
+        for board, field in BOARDS.items()
+        for score, users in UserProfile.objects.filter(**{f'{field}__gt': 0})
+        .values_list(field).annotate(users=Count('id')).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_activity_feed'),
+        ('budgetmanage', '0010_monthly_statements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=10)),
+                ('score', models.PositiveIntegerField()),
+                ('users', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='goals_met',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-streak_count', 'user'], name='profile_streak_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-total_logs', 'user'], name='profile_logs_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-goals_met', 'user'], name='profile_goals_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardbucket',
+            constraint=models.UniqueConstraint(fields=('board', 'score'), name='leaderboard_board_score_uniq'),
+        ),
+        migrations.RunPython(fill_leaderboards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:51
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='preferred_currency',
+            field=models.CharField(default=accounts.models.base_currency, max_length=10),
+        ),
+    ]
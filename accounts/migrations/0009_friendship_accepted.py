@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:59
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def drop_unaccepted_timelines(apps, schema_editor):
+    # Follows so far were never accepted, so they start out pending and take their copies with them.
+    TimelineEntry = apps.get_model('accounts', 'TimelineEntry')
+    TimelineEntry.objects.exclude(owner_id=F('activity__user_id')).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_profile_currency_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='friendship',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(drop_unaccepted_timelines, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
+import datetime
+from django.conf import settings
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db.models import Case, F, Value, When
+from django.contrib.auth.models import AbstractUser, UserManager as AuthUserManager
 from django.utils import timezone
 from django.db import transaction
+from .signals import users_changed
 
 
 class Achievement(models.Model):
@@ -87,7 +91,32 @@ class Achievement(models.Model):
                 defaults=data
             )
 
+def _users_changed(*user_ids):
+    users_changed.send(sender=User, user_ids=user_ids)
+
+
+class UserQuerySet(models.QuerySet):
+    # What a request's authentication and permissions are decided on.
+    AUTH_FIELDS = frozenset({'password', 'is_active', 'is_staff', 'is_superuser', 'username'})
+
+    def update(self, **kwargs):
+        # Bulk updates skip save(). A deactivated user must not stay logged in on a
+        # cached identity; other fields may trail until the identity expires.
+        if not self.AUTH_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            user_ids = list(self.values_list('pk', flat=True))
+            updated = super().update(**kwargs)
+            _users_changed(*user_ids)
+        return updated
+
+
+class UserManager(AuthUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
+    objects = UserManager()
 
     def __str__(self):
         return f"{self.username}"
@@ -108,10 +137,25 @@ class User(AbstractUser):
             super().save(*args, **kwargs)
             if is_new:
                 UserProfile.objects.create(user=self)
+            _users_changed(self.pk)
+
+    def delete(self, *args, **kwargs):
+        _users_changed(self.pk)
+        return super().delete(*args, **kwargs)
+
+    def get_session_auth_hash(self):
+        # Users from the identity cache carry this hash and leave the password deferred.
+        if 'password' not in self.__dict__ and hasattr(self, '_session_auth_hash'):
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
+
+def base_currency():
+    return settings.BASE_CURRENCY
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
-    preferred_currency = models.CharField(max_length=10, default='USD')
+    preferred_currency = models.CharField(max_length=10, default=base_currency)
     monthly_savings_goal = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     last_log_date = models.DateField(null=True, blank=True)
     streak_count = models.IntegerField(default=0)
@@ -120,27 +164,57 @@ class UserProfile(models.Model):
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     dob = models.DateField(null=True, blank=True)
     university = models.CharField(max_length=20, default="No university added")
+    # Running counters so achievement thresholds are checked without COUNT queries.
+    total_logs = models.PositiveIntegerField(default=0)
+    categories_used = models.JSONField(default=list, blank=True)
+    # Months closed with the savings goal met; set by the month-close job.
+    goals_met = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Global leaderboard top-N, highest score first, ties by user.
+            models.Index(fields=['-streak_count', 'user'], name='profile_streak_rank_idx'),
+            models.Index(fields=['-total_logs', 'user'], name='profile_logs_rank_idx'),
+            models.Index(fields=['-goals_met', 'user'], name='profile_goals_rank_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        _users_changed(self.user_id)
+
+    @staticmethod
+    def streak_after(today):
+        # Evaluated inside the UPDATE so parallel logs can't lose or double-count a day.
+        return Case(
+            When(last_log_date__gte=today, then=F('streak_count')),
+            When(last_log_date=today - datetime.timedelta(days=1), then=F('streak_count') + 1),
+            default=Value(1),
+        )
+
+    def next_streak(self, today):
+        if self.last_log_date and self.last_log_date >= today:
+            return self.streak_count
+        if self.last_log_date and (today - self.last_log_date).days == 1:
+            return self.streak_count + 1
+        return 1
+
     def update_streak(self):
         today = timezone.now().date()
-        if self.last_log_date:
-            if (today - self.last_log_date).days == 1:
-                self.streak_count += 1
-            elif (today - self.last_log_date).days > 1:
-                self.streak_count = 1
-        else:
-            self.streak_count = 1
-
+        UserProfile.objects.filter(pk=self.pk).update(
+            streak_count=self.streak_after(today),
+            last_log_date=today,
+        )
+        _users_changed(self.user_id)
+        self.streak_count = self.next_streak(today)
         self.last_log_date = today
-        self.save()
     
     def to_dict(self):
         return {
             "id": self.id,
-            "user_id": self.user.id,
+            "user_id": self.user_id,
             "preferred_currency": self.preferred_currency,
             "monthly_savings_goal": self.monthly_savings_goal,
             "last_log_date": self.last_log_date,
@@ -148,7 +222,14 @@ class UserProfile(models.Model):
         }
 
 class UserActivity(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activities')
+    class Kind(models.TextChoices):
+        LOG = 'log', 'Logged expenses'
+        ACHIEVEMENT = 'achievement', 'Achievement'
+        OTHER = 'other', 'Other'
+
+    # The (user, timestamp, id) index below leads with user.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activities', db_index=False)
+    kind = models.CharField(max_length=12, choices=Kind.choices, default=Kind.OTHER)
     activity_description = models.CharField(max_length=255)
     timestamp = models.DateTimeField(auto_now_add=True)
     friends = models.ManyToManyField("self", blank=True, symmetrical=False)
@@ -156,6 +237,10 @@ class UserActivity(models.Model):
     class Meta:
         ordering = ['-timestamp']
         verbose_name_plural = "User Activities"
+        indexes = [
+            # id is the keyset tie-breaker for the feed's (timestamp, id) cursors.
+            models.Index(fields=['user', 'timestamp', 'id'], name='activity_user_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}: {self.activity_description}"
@@ -166,6 +251,68 @@ class UserActivity(models.Model):
                 "username": friend.user.username,
                 "id": friend.user.id,
             }
-            for friend in self.friends.all()
+            for friend in self.friends.select_related('user')
+        ]
+        return friends_list
+
+
+class Friendship(models.Model):
+    """``user`` asked to follow ``friend``; once ``friend`` accepts, their activity and
+    scores show in the user's feed and friends leaderboard."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='friendships', db_index=False)
+    friend = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers', db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    accepted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'friend'], name='friendship_user_friend_uniq'),
+        ]
+        indexes = [
+            # Who to fan a new activity out to.
+            models.Index(fields=['friend', 'user'], name='friendship_friend_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} follows {self.friend.username}"
+
+
+class TimelineEntry(models.Model):
+    """An activity copied into one reader's feed when settings.ACTIVITY_FANOUT is on."""
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline', db_index=False)
+    activity = models.ForeignKey(UserActivity, on_delete=models.CASCADE, related_name='+')
+    # Copied from the activity so a feed page is one range scan of this table.
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'activity'], name='timeline_owner_activity_uniq'),
         ]
-        return friends_list
\ No newline at end of file
+        indexes = [
+            models.Index(fields=['owner', 'timestamp', 'activity'], name='timeline_owner_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.activity} in {self.owner.username}'s feed"
+
+
+class LeaderboardBucket(models.Model):
+    """How many users have ``score`` on a leaderboard; scores of 0 are not counted.
+
+    Kept exact by budgetmanage.leaderboards as profile counters move, so a
+    rank is a count of the users in higher buckets, not a scan of profiles.
+    """
+
+    board = models.CharField(max_length=10)
+    score = models.PositiveIntegerField()
+    users = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'score'], name='leaderboard_board_score_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.users} user(s) at {self.score} on {self.board}"
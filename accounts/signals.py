@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Sent with ``user_ids`` when a write changes what may be cached for those users.
+users_changed = Signal()
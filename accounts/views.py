@@ -44,7 +44,7 @@ def auth(request):
                 user.set_password(signup_form.cleaned_data['password'])
                 user.username = user.email
                 user.save()
-                login(request, user)
+                login(request, user, backend='accounts.backends.CachedModelBackend')
                 return JsonResponse({'success': True})
             else:
                 return JsonResponse({'success': False, 'error': signup_form.errors}, status=400)
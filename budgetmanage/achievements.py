@@ -0,0 +1,168 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from accounts.models import Achievement, UserProfile
+from . import feed, leaderboards
+from .caching import invalidate_user
+from .models import Expense
+
+Keys = Achievement.AchievementKeys
+
+LOG_TIERS = ((1, Keys.FIRST_LOG), (10, Keys.TENTH_LOG), (50, Keys.FIFTIETH_LOG))
+STREAK_TIERS = ((3, Keys.THREE_DAY_STREAK), (7, Keys.SEVEN_DAY_STREAK), (30, Keys.THIRTY_DAY_STREAK))
+CATEGORY_TIERS = ((5, Keys.CATEGORY_EXPLORER),)
+
+_catalog = None
+
+
+def catalog():
+    # The catalog is static, so load (and seed, if needed) it once per process.
+    global _catalog
+    if _catalog is None:
+        achievements = {achievement.key: achievement for achievement in Achievement.objects.all()}
+        if len(achievements) < len(Keys):
+            Achievement.populate_achievements()
+            achievements = {achievement.key: achievement for achievement in Achievement.objects.all()}
+        _catalog = achievements
+    return _catalog
+
+
+def crossed(tiers, before, after):
+    return [key for threshold, key in tiers if before < threshold <= after]
+
+
+def reached(tiers, value):
+    return [key for threshold, key in tiers if value >= threshold]
+
+
+def award(profile, keys):
+    if not keys:
+        return []
+    catalog()
+    Through = UserProfile.achievements.through
+    Through.objects.bulk_create(
+        [Through(userprofile_id=profile.pk, achievement_id=key) for key in keys],
+        ignore_conflicts=True,
+    )
+    return list(keys)
+
+
+def locked_profile(user):
+    return UserProfile.objects.select_for_update().get(user_id=user.pk)
+
+
+def record_logs(profile, count, categories, today=None):
+    """Count ``count`` newly logged expenses against the profile and award what they unlock.
+
+    This is a single UPDATE. Pass a profile from locked_profile() inside the
+    caller's transaction so the before/after values used for awards are exact.
+    """
+    today = today or timezone.now().date()
+    new_categories = [category for category in sorted(set(categories)) if category not in profile.categories_used]
+    updates = {
+        'total_logs': F('total_logs') + count,
+        'streak_count': UserProfile.streak_after(today),
+        'last_log_date': today,
+    }
+    if new_categories:
+        updates['categories_used'] = profile.categories_used + new_categories
+    UserProfile.objects.filter(pk=profile.pk).update(**updates)
+    invalidate_user(profile.user_id)
+
+    before = (profile.total_logs, len(profile.categories_used), profile.streak_count)
+    profile.total_logs += count
+    profile.categories_used = profile.categories_used + new_categories
+    profile.streak_count = profile.next_streak(today)
+    profile.last_log_date = today
+
+    leaderboards.moved(
+        leaderboards.moves('logs', before[0], profile.total_logs)
+        + leaderboards.moves('streak', before[2], profile.streak_count)
+    )
+    awarded = award(profile, (
+        crossed(LOG_TIERS, before[0], profile.total_logs)
+        + crossed(CATEGORY_TIERS, before[1], len(profile.categories_used))
+        + crossed(STREAK_TIERS, before[2], profile.streak_count)
+    ))
+    if count:
+        feed.log_activities(profile.user_id, count, categories, [catalog()[key] for key in awarded])
+    return awarded
+
+
+def badges(profile):
+    """Every achievement in catalog order, marking what the profile has earned and how close the rest are."""
+    earned = set(profile.achievements.values_list('key', flat=True))
+    progress = {}
+    for tiers, value, unit in (
+        (LOG_TIERS, profile.total_logs, 'logs'),
+        (STREAK_TIERS, profile.streak_count, 'days'),
+        (CATEGORY_TIERS, len(profile.categories_used), 'categories'),
+    ):
+        for threshold, key in tiers:
+            progress[key] = f"{min(value, threshold)}/{threshold} {unit}"
+
+    achievements = catalog()
+    items = [
+        {
+            'key': key,
+            'name': achievements[key].name,
+            'description': achievements[key].description,
+            'icon': achievements[key].icon,
+            'earned': key in earned,
+            'progress': '' if key in earned else progress.get(key, ''),
+        }
+        for key in Keys if key in achievements
+    ]
+    return {'earned': len(earned), 'total': len(items), 'badges': items}
+
+
+def longest_streak(days):
+    longest = current = 0
+    previous = None
+    for day in days:
+        current = current + 1 if previous and (day - previous).days == 1 else 1
+        longest = max(longest, current)
+        previous = day
+    return longest
+
+
+def backfill(profiles):
+    """Recompute counters for a batch of profiles from their expenses and award historical achievements."""
+    profiles = list(profiles)
+    user_ids = [profile.user_id for profile in profiles]
+    logs = dict(
+        Expense.objects.filter(user_id__in=user_ids).values_list('user_id').annotate(n=Count('id')).order_by()
+    )
+    categories, days = {}, {}
+    for user_id, category in (
+        Expense.objects.filter(user_id__in=user_ids).values_list('user_id', 'category').distinct().order_by()
+    ):
+        categories.setdefault(user_id, []).append(category)
+    for user_id, day in (
+        Expense.objects.filter(user_id__in=user_ids).values_list('user_id', 'date').distinct().order_by('user_id', 'date')
+    ):
+        days.setdefault(user_id, []).append(day)
+
+    catalog()
+    Through = UserProfile.achievements.through
+    awards = []
+    for profile in profiles:
+        profile.total_logs = logs.get(profile.user_id, 0)
+        profile.categories_used = sorted(categories.get(profile.user_id, []))
+        streak = max(profile.streak_count, longest_streak(days.get(profile.user_id, [])))
+        keys = (
+            reached(LOG_TIERS, profile.total_logs)
+            + reached(CATEGORY_TIERS, len(profile.categories_used))
+            + reached(STREAK_TIERS, streak)
+        )
+        if profile.monthly_savings_goal > 0:
+            keys.append(Keys.GOAL_SETTER)
+        awards += [Through(userprofile_id=profile.pk, achievement_id=key) for key in keys]
+
+    with transaction.atomic():
+        UserProfile.objects.bulk_update(profiles, ['total_logs', 'categories_used'])
+        for profile in profiles:
+            invalidate_user(profile.user_id)
+        Through.objects.bulk_create(awards, ignore_conflicts=True)
+    return len(awards)
@@ -1,15 +1,201 @@
+import datetime
+import json
+
+from django import forms
 from django.contrib import admin
-from .models import Expense, RecurringExpense
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.db.models import Max, Min
+from django.utils.functional import cached_property
+
+from accounts.models import User
+from . import search
+from .models import ExchangeRate, Expense, MonthlyStatement, RecurringExpense
+
+# Past this many rows the changelist shows an estimate instead of counting.
+EXACT_COUNT = 10_000
+# Category filter choices come from this many of the newest rows.
+RECENT_CATEGORIES = 10_000
+
+
+def estimated_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        exact = self.object_list.order_by()[:EXACT_COUNT + 1].count()
+        if exact <= EXACT_COUNT:
+            return exact
+        return max(estimated_count(self.object_list), exact)
+
+
+class DrilldownQuerySet(models.QuerySet):
+    """Answers the date hierarchy from the first and last date alone.
+
+    Every year, month or day between them is listed, so the drilldown costs
+    two index lookups instead of a scan for the distinct periods.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        # SQLite turns only a lone MIN() or MAX() into an index lookup; both at once scan the table.
+        if connections[self.db].vendor != 'sqlite' or args or len(kwargs) < 2 \
+                or not all(isinstance(value, (Min, Max)) for value in kwargs.values()):
+            return super().aggregate(*args, **kwargs)
+        result = {}
+        for name, value in kwargs.items():
+            result.update(super().aggregate(**{name: value}))
+        return result
+
+    def dates(self, field_name, kind, order='ASC'):
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        first, last = bounds['first'], bounds['last']
+        if first is None:
+            return []
+        if kind == 'year':
+            periods = [datetime.date(year, 1, 1) for year in range(first.year, last.year + 1)]
+        elif kind == 'month':
+            periods = [
+                datetime.date(month // 12, month % 12 + 1, 1)
+                for month in range(first.year * 12 + first.month - 1, last.year * 12 + last.month)
+            ]
+        else:
+            periods = [first + datetime.timedelta(days=n) for n in range((last - first).days + 1)]
+        return periods[::-1] if order == 'DESC' else periods
+
+
+class UserFilter(admin.SimpleListFilter):
+    """Picks the user with the admin autocomplete instead of listing every user."""
+
+    title = 'user'
+    parameter_name = 'user'
+    template = 'admin/budgetmanage/autocomplete_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        self.model_admin = model_admin
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        if not self.value().isdigit():
+            raise IncorrectLookupParameters(f"Invalid user {self.value()!r}.")
+        return queryset.filter(user_id=self.value())
+
+    def widget(self):
+        field = forms.ModelChoiceField(
+            User.objects.all(), required=False,
+            widget=AutocompleteSelect(self.model_admin.model._meta.get_field('user'), self.model_admin.admin_site),
+        )
+        return field.widget.render(self.parameter_name, self.value(), attrs={'id': 'user-filter'})
+
+
+class CategoryFilter(admin.SimpleListFilter):
+    title = 'category'
+    parameter_name = 'category'
+
+    def lookups(self, request, model_admin):
+        recent = model_admin.model.objects.order_by('-pk').values_list('category', flat=True)[:RECENT_CATEGORIES]
+        return [(category, category) for category in sorted(set(recent))]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(category=self.value())
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    list_select_related = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return DrilldownQuerySet(self.model, query=queryset.query, using=queryset.db)
+
+    @property
+    def media(self):
+        widget = AutocompleteSelect(self.model._meta.get_field('user'), self.admin_site)
+        return super().media + widget.media + forms.Media(js=['js/admin-filters.js'])
+
+
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'category', 'amount', 'description', 'date')
-    list_filter = ('user', 'category', 'date')
-    search_fields = ('user', 'date', 'category')
+class ExpenseAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'category', 'amount', 'currency', 'base_amount', 'description', 'date')
+    list_filter = (UserFilter, CategoryFilter)
+    date_hierarchy = 'date'
+    autocomplete_fields = ('user', 'recurring')
+    # Declared so the search box shows; get_search_results answers it from the full-text index.
+    search_fields = ('description', 'category')
+    search_help_text = (
+        "Words from the description or category; each word also matches as a prefix. "
+        f"Shows the newest {search.ADMIN_MATCHES:,} matches."
+    )
     ordering = ('-date',)
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_matches(queryset, search_term, search.ADMIN_MATCHES), False
+
+
 @admin.register(RecurringExpense)
-class RecurringExpenseAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'category', 'amount', 'description', 'frequency')
-    list_filter = ('user', 'category', 'start_date')
-    search_fields = ('user', 'start_date', 'category')
-    ordering = ('-start_date',)
\ No newline at end of file
+class RecurringExpenseAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'category', 'amount', 'currency', 'description', 'frequency')
+    list_filter = (UserFilter, CategoryFilter, 'frequency')
+    date_hierarchy = 'start_date'
+    autocomplete_fields = ('user',)
+    search_fields = ('user__username', 'description', 'category')
+    ordering = ('-start_date',)
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'date', 'rate')
+    list_filter = ('currency',)
+    date_hierarchy = 'date'
+    ordering = ('currency', '-date')
+
+    def has_change_permission(self, request, obj=None):
+        # Rates change through load_exchange_rates, which also re-prices the expenses.
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(MonthlyStatement)
+class MonthlyStatementAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'month', 'total', 'currency', 'count', 'goal', 'goal_met', 'stale')
+    list_filter = (UserFilter, 'goal_met', 'stale')
+    date_hierarchy = 'month'
+    autocomplete_fields = ('user',)
+    ordering = ('-month',)
+
+    def has_change_permission(self, request, obj=None):
+        # Statements are written by close_month and never edited.
+        return False
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class BudgetmanageConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'budgetmanage'
+
+    def ready(self):
+        from . import signals
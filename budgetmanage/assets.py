@@ -0,0 +1,78 @@
+from pathlib import Path
+
+from django.conf import settings
+
+BUNDLE_DIR = 'bundles'
+
+# Per-page CSS and JS, in load order. Pages load their scripts as ES modules
+# except the QR scanner, which relies on the qr-scanner UMD global.
+BUNDLES = {
+    'index': {'css': ['css/main.css', 'css/landing.css'], 'js': ['js/theme.js', 'js/landing.js']},
+    'login': {'css': ['css/main.css', 'css/auth.css'], 'js': ['js/theme.js', 'js/auth.js']},
+    'dashboard': {
+        'css': ['css/main.css', 'css/forms.css'],
+        'js': ['js/theme.js', 'js/navigation.js', 'js/dashboard.js'],
+    },
+    'add-expense': {
+        'css': ['css/main.css', 'css/forms.css'],
+        'js': ['js/theme.js', 'js/navigation.js', 'js/expense-form.js'],
+    },
+    'analytics': {
+        'css': ['css/main.css', 'css/forms.css', 'css/analytics.css'],
+        'js': ['js/theme.js', 'js/navigation.js', 'js/analytics.js'],
+    },
+    'recurring': {
+        'css': ['css/main.css', 'css/forms.css', 'css/recurring.css'],
+        'js': ['js/theme.js', 'js/navigation.js', 'js/recurring.js'],
+    },
+    'settings': {
+        'css': ['css/main.css', 'css/forms.css', 'css/settings.css'],
+        'js': ['js/theme.js', 'js/navigation.js', 'js/settings.js'],
+    },
+    'profile': {
+        'css': ['css/main.css', 'css/profile.css'],
+        'js': ['js/theme.js', 'js/navigation.js', 'js/profile.js'],
+    },
+    'qr-scanner': {
+        'css': ['css/main.css', 'css/qr-scanner.css'],
+        'js': ['js/theme.js', 'js/navigation.js', 'js/qr-scanner.js'],
+        'module': False,
+    },
+}
+
+
+def is_module(page):
+    return BUNDLES[page].get('module', True)
+
+
+def bundle_path(page, kind):
+    return f"{BUNDLE_DIR}/{page}.{kind}"
+
+
+def asset_paths(page, kind):
+    """Static paths a page loads: its bundle when bundling is on, otherwise the sources."""
+    if settings.ASSET_BUNDLES:
+        return [bundle_path(page, kind)]
+    return BUNDLES[page][kind]
+
+
+def _join_js(sources, module):
+    if module:
+        # Each module file had its own scope; a block keeps their top-level names apart.
+        return ''.join(f"{{\n{source}\n}}\n" for source in sources)
+    return ''.join(f"{source}\n;\n" for source in sources)
+
+
+def build_bundles(source_dir, pages=None):
+    """Concatenate each page's files into <source_dir>/bundles/ and return the paths written."""
+    source_dir = Path(source_dir)
+    (source_dir / BUNDLE_DIR).mkdir(exist_ok=True)
+    written = []
+    for page in pages or BUNDLES:
+        for kind in ('css', 'js'):
+            sources = [(source_dir / path).read_text(encoding='utf-8') for path in BUNDLES[page][kind]]
+            content = _join_js(sources, is_module(page)) if kind == 'js' else '\n'.join(sources)
+            target = source_dir / bundle_path(page, kind)
+            target.write_text(content, encoding='utf-8')
+            written.append(target)
+    return written
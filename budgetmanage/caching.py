@@ -0,0 +1,215 @@
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+
+USER_CACHE_ALIAS = 'tiered'
+USER_TIMEOUT = 60 * 15
+
+# Keyed by LOCATION so every thread of the process shares one local tier;
+# django.core.cache.caches hands each thread its own backend instance.
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, pickled = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return pickled
+
+    def set(self, key, pickled, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def delete(self, key):
+        with self.lock:
+            return self.entries.pop(key, None) is not None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TieredCache(BaseCache):
+    """A bounded in-process LRU in front of the cache alias named by LOCATION.
+
+    The local tier is only invalidated in the process that writes, so keep
+    mutable values out of it; versioned keys (see user_key()) are safe.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        with _local_tiers_lock:
+            self._local = _local_tiers.setdefault(location, LocalTier(options.get('LOCAL_MAX_ENTRIES', 1000)))
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _keep_local(self, key, value, timeout):
+        ttl = self._local_ttl(timeout)
+        if ttl > 0:
+            self._local.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version)
+        pickled = self._local.get(local_key)
+        if pickled is not None:
+            self._local.stats['local_hits'] += 1
+            return pickle.loads(pickled)
+
+        missing = object()
+        value = self.shared.get(key, missing, version)
+        if value is missing:
+            self._local.stats['misses'] += 1
+            return default
+        self._local.stats['shared_hits'] += 1
+        self._keep_local(local_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version)
+        self.shared.set(key, value, timeout, version)
+        self._keep_local(local_key, value, timeout)
+        self._local.stats['sets'] += 1
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version)
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._keep_local(local_key, value, timeout)
+            self._local.stats['sets'] += 1
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._local.delete(self.make_and_validate_key(key, version))
+        return self.shared.delete(key, version)
+
+    def has_key(self, key, version=None):
+        if self._local.get(self.make_and_validate_key(key, version)) is not None:
+            return True
+        return self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete(self.make_and_validate_key(key, version))
+        return self.shared.incr(key, delta, version)
+
+    def clear(self):
+        self._local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        stats = self._local.stats
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        return {
+            'local_hits': stats['local_hits'],
+            'shared_hits': stats['shared_hits'],
+            'misses': stats['misses'],
+            'sets': stats['sets'],
+            'evictions': stats['evictions'],
+            'local_entries': len(self._local.entries),
+            'hit_ratio': round((lookups - stats['misses']) / lookups, 4) if lookups else None,
+        }
+
+
+def _generation_key(user_id):
+    return f"user-generation:{user_id}"
+
+
+def user_generation(user_id):
+    # Generations live in the shared cache only, so every process sees a bump at once.
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_user(user_id):
+    # A fresh clock value rather than incr(): two racing bumps can't collapse into one.
+    cache.set(_generation_key(user_id), time.time_ns(), None)
+
+
+def bump_users(user_ids):
+    now = time.time_ns()
+    cache.set_many({_generation_key(user_id): now for user_id in user_ids}, None)
+
+
+def invalidate_user(user_id):
+    """Orphan every cached entry of the user once the current transaction commits."""
+    transaction.on_commit(partial(bump_user, user_id))
+
+
+def invalidate_users(user_ids):
+    """invalidate_user() for many users, with one cache round trip."""
+    transaction.on_commit(partial(bump_users, list(user_ids)))
+
+
+def user_key(user_id, name):
+    return f"user:{user_id}:{user_generation(user_id)}:{name}"
+
+
+def _lookup(user_id, name):
+    key = user_key(user_id, name)
+    return key, caches[USER_CACHE_ALIAS].get(key)
+
+
+def cached_for_user(user_id, name, compute, timeout=USER_TIMEOUT):
+    # The key is taken before computing, so a write that commits meanwhile
+    # leaves the result under a generation that is already stale.
+    key, value = _lookup(user_id, name)
+    if value is None:
+        value = compute()
+        caches[USER_CACHE_ALIAS].set(key, value, timeout)
+    return value
+
+
+async def acached_for_user(user_id, name, compute, timeout=USER_TIMEOUT):
+    # The backends are sync; one thread hop covers the generation and the lookup.
+    key, value = await sync_to_async(_lookup)(user_id, name)
+    if value is None:
+        value = await compute()
+        await caches[USER_CACHE_ALIAS].aset(key, value, timeout)
+    return value
+
+
+def stats():
+    return caches[USER_CACHE_ALIAS].stats()
@@ -0,0 +1,10 @@
+from functools import partial
+
+from .caching import user_generation
+
+
+def user_cache(request):
+    # A callable, so the generation is only looked up by templates that vary on it.
+    if not request.user.is_authenticated:
+        return {}
+    return {'user_generation': partial(user_generation, request.user.pk)}
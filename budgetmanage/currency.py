@@ -0,0 +1,209 @@
+import bisect
+import csv
+import datetime
+import re
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .caching import invalidate_user
+from .models import ExchangeRate, Expense
+
+BASE_CURRENCY = settings.BASE_CURRENCY
+CODE = re.compile(r'^[A-Z]{3}$')
+RATES_VERSION_KEY = 'exchange-rates-version'
+# How long a process keeps using its rates before checking whether they were reloaded.
+RATES_CHECK = 60
+MAX_LOOKUPS = 100_000
+# Base amounts are stored with max_digits=14.
+MAX_BASE_CENTS = 10 ** 14
+BATCH_SIZE = 2000
+
+
+class CurrencyError(ValueError):
+    pass
+
+
+class RateTable:
+    """Exchange rates to the base currency, held in memory by each process.
+
+    Lookups are memoized by (currency, date) and resolve to the latest rate
+    on or before that date. A currency's rates are read in one query on first
+    use; loading new rates bumps a shared version the other processes pick up.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.lookups = {}
+        self.version = None
+        self.checked = None
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.checked is not None and now - self.checked < RATES_CHECK:
+            return
+        version = cache.get(RATES_VERSION_KEY)
+        with self.lock:
+            self.checked = now
+            if version != self.version:
+                self.version = version
+                self.series.clear()
+                self.lookups.clear()
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+            self.lookups.clear()
+            self.checked = None
+
+    def _series(self, currency):
+        series = self.series.get(currency)
+        if series is None:
+            rows = ExchangeRate.objects.filter(currency=currency).order_by('date').values_list('date', 'rate')
+            series = self.series[currency] = tuple(zip(*rows)) or ((), ())
+        return series
+
+    def rate(self, currency, day):
+        if currency == BASE_CURRENCY:
+            return Decimal(1)
+        self.refresh()
+        key = (currency, day)
+        rate = self.lookups.get(key)
+        if rate is None:
+            days, rates = self._series(currency)
+            index = bisect.bisect_right(days, day) - 1
+            if index < 0:
+                raise CurrencyError(f"No {currency} exchange rate on or before {day}.")
+            rate = rates[index]
+            if len(self.lookups) >= MAX_LOOKUPS:
+                self.lookups.clear()
+            self.lookups[key] = rate
+        return rate
+
+    def rates(self, currencies, days):
+        """Rates for parallel lists of currencies and dates, looked up once per distinct pair."""
+        found = {key: float(self.rate(*key)) for key in set(zip(currencies, days))}
+        return np.array([found[key] for key in zip(currencies, days)], dtype=float)
+
+
+RATES = RateTable()
+
+
+def _cents(amounts):
+    return np.array([int(Decimal(amount).scaleb(2)) for amount in amounts], dtype=np.int64)
+
+
+def _amounts(cents):
+    if np.any(np.abs(cents) >= MAX_BASE_CENTS):
+        raise CurrencyError("Converted amount is too large.")
+    return [Decimal(int(value)).scaleb(-2) for value in cents]
+
+
+def to_base(amounts, currencies, days):
+    """Convert amounts into the base currency in one vectorized pass, rounding to the cent."""
+    if not amounts:
+        return []
+    return _amounts(np.rint(_cents(amounts) * RATES.rates(currencies, days)))
+
+
+def from_base(amounts, currency, days):
+    """Express base-currency amounts in ``currency`` at each day's rate."""
+    if not amounts:
+        return []
+    return _amounts(np.rint(_cents(amounts) / RATES.rates([currency] * len(days), days)))
+
+
+def covers(currency, day):
+    try:
+        RATES.rate(currency, day)
+    except CurrencyError:
+        return False
+    return True
+
+
+def preferred(user):
+    # A preferred currency nothing can be converted from yet falls back to the base.
+    currency = user.profile.preferred_currency.upper()
+    if CODE.match(currency) and covers(currency, timezone.localdate()):
+        return currency
+    return BASE_CURRENCY
+
+
+def fill_base_amounts(expenses):
+    """Set base_amount on unsaved expenses, for bulk_create() which skips the save path."""
+    date_field, amount_field = Expense._meta.get_field('date'), Expense._meta.get_field('amount')
+    days = [date_field.to_python(expense.date) for expense in expenses]
+    amounts = to_base(
+        [amount_field.to_python(expense.amount) for expense in expenses],
+        [expense.currency for expense in expenses], days,
+    )
+    for expense, amount in zip(expenses, amounts):
+        expense.base_amount = amount
+    return expenses
+
+
+def read_rates(stream):
+    """Parse ``date,currency,rate`` CSV rows, where rate is one unit's worth in the base currency."""
+    reader = csv.DictReader(stream)
+    if not {'date', 'currency', 'rate'} <= {name.strip().lower() for name in reader.fieldnames or []}:
+        raise CurrencyError("The rates file needs date, currency and rate columns.")
+    rows = {}
+    for line_no, raw in enumerate(reader, start=2):
+        raw = {key.strip().lower(): (value or '').strip() for key, value in raw.items() if key}
+        code = raw['currency'].upper()
+        try:
+            day = datetime.date.fromisoformat(raw['date'])
+            rate = Decimal(raw['rate'])
+        except (ValueError, InvalidOperation):
+            raise CurrencyError(f"Line {line_no}: invalid date or rate.")
+        if not CODE.match(code) or code == BASE_CURRENCY:
+            raise CurrencyError(f"Line {line_no}: {code!r} is not a currency that needs a rate.")
+        if not rate.is_finite() or rate <= 0:
+            raise CurrencyError(f"Line {line_no}: the rate must be positive.")
+        rows[code, day] = rate
+    return rows
+
+
+def reconvert(since, batch_size=BATCH_SIZE):
+    """Recompute base amounts of expenses in each currency from its date on; return the users touched."""
+    users = set()
+    for code, day in since.items():
+        expenses = Expense.objects.filter(currency=code, date__gte=day).order_by('pk')
+        last = 0
+        while batch := list(
+            expenses.filter(pk__gt=last).values_list('pk', 'user_id', 'date', 'amount', 'base_amount')[:batch_size]
+        ):
+            last = batch[-1][0]
+            converted = to_base([row[3] for row in batch], [code] * len(batch), [row[2] for row in batch])
+            changed = [(row, amount) for row, amount in zip(batch, converted) if amount != row[4]]
+            Expense.objects.bulk_update([Expense(pk=row[0], base_amount=amount) for row, amount in changed], ['base_amount'])
+            users.update(row[1] for row, _ in changed)
+    return users
+
+
+def load_rates(rates):
+    """Store ``{(currency, date): rate}`` and re-price the expenses the new rates apply to."""
+    since = {}
+    for code, day in rates:
+        since[code] = min(day, since.get(code, day))
+    with transaction.atomic():
+        ExchangeRate.objects.bulk_create(
+            [ExchangeRate(currency=code, date=day, rate=rate) for (code, day), rate in rates.items()],
+            update_conflicts=True, unique_fields=['currency', 'date'], update_fields=['rate'],
+            batch_size=BATCH_SIZE,
+        )
+        RATES.clear()
+        users = reconvert(since)
+        for user_id in users:
+            rollups.rebuild_user(user_id)
+            invalidate_user(user_id)
+        transaction.on_commit(lambda: cache.set(RATES_VERSION_KEY, time.time_ns(), None))
+    return users
@@ -0,0 +1,68 @@
+import os
+import tempfile
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+POSTGRES_SCHEMES = ('postgres', 'postgresql', 'pgsql')
+SQLITE_TIMEOUT = 20
+
+
+def sqlite_config(path):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        # SQLite ignores SELECT ... FOR UPDATE; taking the write lock at BEGIN
+        # serializes the read-then-update steps of the expense write path instead.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_TIMEOUT,
+        },
+        # A file rather than the in-memory default, so threaded tests share one
+        # database; kept out of the tree with the -wal/-shm files WAL mode leaves.
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), f"budgetmanage-test-{os.path.basename(path)}")},
+    }
+
+
+def postgres_config(url, environ):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': unquote(url.path.lstrip('/')),
+        'USER': unquote(url.username or ''),
+        'PASSWORD': unquote(url.password or ''),
+        'HOST': url.hostname or '',
+        'PORT': str(url.port or ''),
+        'CONN_MAX_AGE': int(environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': dict(parse_qsl(url.query)),
+    }
+
+    pool = environ.get('DB_POOL', '').lower()
+    if pool == 'psycopg':
+        # Django's built-in pool (psycopg 3, Django 5.1+) hands connections back
+        # at the end of each request, so it replaces persistent connections.
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': int(environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(environ.get('DB_POOL_MAX_SIZE', 10)),
+        }
+    elif pool == 'pgbouncer':
+        # Transaction pooling can move a session between server connections,
+        # which breaks named cursors.
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    elif pool:
+        raise ValueError(f"Unknown DB_POOL {pool!r}; use 'psycopg' or 'pgbouncer'.")
+    return config
+
+
+def database_config(environ, default_sqlite_path):
+    """Build the default database from DATABASE_URL, falling back to the local SQLite file."""
+    url = environ.get('DATABASE_URL')
+    if not url:
+        return sqlite_config(default_sqlite_path)
+
+    parsed = urlsplit(url)
+    if parsed.scheme in POSTGRES_SCHEMES:
+        return postgres_config(parsed, environ)
+    if parsed.scheme == 'sqlite':
+        # sqlite:///relative.db and sqlite:////absolute/path.db
+        return sqlite_config(unquote(parsed.path[1:]) or default_sqlite_path)
+    raise ValueError(f"Unsupported DATABASE_URL scheme {parsed.scheme!r}.")
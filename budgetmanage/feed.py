@@ -0,0 +1,189 @@
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import Friendship, TimelineEntry, UserActivity
+from .caching import invalidate_user
+from .payloads import from_version, version
+
+PAGE_SIZE = 30
+BATCH_SIZE = 1000
+# How much of a friend's history a new follower's timeline starts with.
+FOLLOW_BACKFILL = 200
+
+Kind = UserActivity.Kind
+FIELDS = ('user__username', 'kind', 'activity_description', 'timestamp')
+
+
+class FeedError(ValueError):
+    pass
+
+
+def log_activities(user_id, count, categories, achievements):
+    """Activities for ``count`` newly logged expenses and the achievements they earned.
+
+    Amounts stay out of the description: friends see that something was
+    logged, not how much was spent.
+    """
+    categories = sorted(set(categories))
+    if count == 1:
+        text = f"Logged an expense in {categories[0]}" if categories else "Logged an expense"
+    else:
+        text = f"Logged {count} expenses"
+        if 0 < len(categories) <= 3:
+            text += f" in {', '.join(categories)}"
+    activities = [UserActivity(user_id=user_id, kind=Kind.LOG, activity_description=text[:255])]
+    activities += [
+        UserActivity(user_id=user_id, kind=Kind.ACHIEVEMENT, activity_description=f"Earned {achievement.name}")
+        for achievement in achievements
+    ]
+    return record(activities)
+
+
+def record(activities):
+    UserActivity.objects.bulk_create(activities, batch_size=BATCH_SIZE)
+    if settings.ACTIVITY_FANOUT:
+        fan_out(activities)
+    return activities
+
+
+def fan_out(activities):
+    """Copy saved activities into their authors' and followers' timelines."""
+    followers = {}
+    for friend_id, user_id in Friendship.objects.filter(
+        friend_id__in={activity.user_id for activity in activities}, accepted_at__isnull=False,
+    ).values_list('friend_id', 'user_id'):
+        followers.setdefault(friend_id, []).append(user_id)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner_id=owner_id, activity_id=activity.pk, timestamp=activity.timestamp)
+            for activity in activities
+            for owner_id in [activity.user_id, *followers.get(activity.user_id, ())]
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def follow(user, friend):
+    """Ask to follow ``friend``. Nothing of theirs is shown until they accept()."""
+    if user.pk == friend.pk:
+        raise FeedError("You can't follow yourself.")
+    _, created = Friendship.objects.get_or_create(user=user, friend=friend)
+    return created
+
+
+def accept(user, follower):
+    """Let ``follower`` see the user's activity and scores."""
+    accepted = Friendship.objects.filter(user=follower, friend=user, accepted_at__isnull=True).update(
+        accepted_at=timezone.now()
+    )
+    if not accepted:
+        raise FeedError(f"{follower.username} has not asked to follow you.")
+    invalidate_user(follower.pk)
+    if settings.ACTIVITY_FANOUT:
+        recent = (
+            UserActivity.objects.filter(user=user)
+            .order_by('-timestamp', '-id').values_list('pk', 'timestamp')[:FOLLOW_BACKFILL]
+        )
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner=follower, activity_id=pk, timestamp=timestamp) for pk, timestamp in recent],
+            ignore_conflicts=True,
+        )
+
+
+def unfollow(user, friend):
+    """End the friendship either way round, including pending requests."""
+    deleted, _ = Friendship.objects.filter(Q(user=user, friend=friend) | Q(user=friend, friend=user)).delete()
+    if deleted:
+        invalidate_user(user.pk)
+        invalidate_user(friend.pk)
+        TimelineEntry.objects.filter(
+            Q(owner=user, activity__user=friend) | Q(owner=friend, activity__user=user)
+        ).delete()
+    return bool(deleted)
+
+
+def friends(user):
+    following = Friendship.objects.filter(user=user).order_by('friend__username')
+    requests = Friendship.objects.filter(friend=user, accepted_at__isnull=True).order_by('created_at')
+    return {
+        'following': [
+            {'id': pk, 'username': username, 'accepted': accepted_at is not None}
+            for pk, username, accepted_at in following.values_list('friend_id', 'friend__username', 'accepted_at')
+        ],
+        'requests': [
+            {'id': pk, 'username': username}
+            for pk, username in requests.values_list('user_id', 'user__username')
+        ],
+    }
+
+
+def encode_cursor(timestamp, pk):
+    return f"{version(timestamp)}-{pk}"
+
+
+def decode_cursor(cursor):
+    try:
+        stamp, pk = (int(part) for part in cursor.split('-'))
+        return from_version(stamp), pk
+    except (ValueError, OverflowError):
+        raise FeedError("Invalid cursor.")
+
+
+def _before(field, pk_field, cursor):
+    # Keyset on (timestamp, id), newest first. The outer <= bound keeps it an index range.
+    moment, pk = cursor
+    return Q(**{f'{field}__lte': moment}) & (Q(**{f'{field}__lt': moment}) | Q(**{f'{pk_field}__lt': pk}))
+
+
+def _serialize(activity):
+    return {
+        'id': activity.pk,
+        'user': {'id': activity.user_id, 'username': activity.user.username},
+        'kind': activity.kind,
+        'description': activity.activity_description,
+        'timestamp': activity.timestamp,
+    }
+
+
+def page(user, cursor=None, limit=PAGE_SIZE):
+    """One page of the user's and their friends' activity, newest first, and the next cursor."""
+    if settings.ACTIVITY_FANOUT:
+        entries = TimelineEntry.objects.filter(owner=user)
+        if cursor:
+            entries = entries.filter(_before('timestamp', 'activity_id', cursor))
+        activities = [
+            entry.activity for entry in
+            entries.select_related('activity__user')
+            .only('timestamp', 'activity_id', *(f'activity__{field}' for field in FIELDS))
+            .order_by('-timestamp', '-activity_id')[:limit + 1]
+        ]
+    else:
+        authors = [
+            user.pk,
+            *Friendship.objects.filter(user=user, accepted_at__isnull=False).values_list('friend_id', flat=True),
+        ]
+        queryset = UserActivity.objects.filter(user_id__in=authors)
+        if cursor:
+            queryset = queryset.filter(_before('timestamp', 'id', cursor))
+        activities = list(
+            queryset.select_related('user').only(*FIELDS).order_by('-timestamp', '-id')[:limit + 1]
+        )
+
+    next_cursor = None
+    if len(activities) > limit:
+        activities = activities[:limit]
+        next_cursor = encode_cursor(activities[-1].timestamp, activities[-1].pk)
+    return [_serialize(activity) for activity in activities], next_cursor
+
+
+def rebuild_timelines(batch_size=BATCH_SIZE):
+    """Refill every timeline from the activity table, for turning ACTIVITY_FANOUT on late."""
+    TimelineEntry.objects.all().delete()
+    last, written = 0, 0
+    while batch := list(UserActivity.objects.filter(pk__gt=last).order_by('pk')[:batch_size]):
+        fan_out(batch)
+        written += len(batch)
+        last = batch[-1].pk
+    return written
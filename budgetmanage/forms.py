@@ -1,12 +1,35 @@
+import datetime
+
 from django import forms
-from .models import Expense, RecurringExpense
+from django.db.models import Q
+from accounts.models import User
+from .currency import CODE, preferred
+from .imports import detect_format
+from .models import AnalyticsCache, Expense, RecurringExpense
+from .payloads import period_bounds
+
+class CurrencyMixin:
+    """Optional ISO 4217 code, defaulting to the user's preferred currency.
+
+    The model's clean() rejects codes with no exchange rate on the date.
+    """
 
-class AddExpenseForm(forms.ModelForm):
+    def clean_currency(self):
+        currency = self.cleaned_data['currency'].strip().upper()
+        if not currency:
+            return preferred(self.user) if self.user else ''
+        if not CODE.match(currency):
+            raise forms.ValidationError("Enter a three-letter currency code, like USD.")
+        return currency
+
+
+class AddExpenseForm(CurrencyMixin, forms.ModelForm):
     category_name = forms.CharField(widget=forms.HiddenInput())
+    currency = forms.CharField(required=False, max_length=3)
 
     class Meta:
         model = Expense
-        fields = ['amount', 'date', 'description']
+        fields = ['amount', 'currency', 'date', 'description']
         widgets = {
             'amount': forms.NumberInput(attrs={'placeholder': '0.00', 'step': '0.01'}),
             'date': forms.DateInput(attrs={'type': 'date'}),
@@ -26,8 +49,9 @@ class AddExpenseForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
 
-class RecurringExpenseForm(forms.ModelForm):
+class RecurringExpenseForm(CurrencyMixin, forms.ModelForm):
     category_name = forms.CharField(widget=forms.HiddenInput())
+    currency = forms.CharField(required=False, max_length=3)
     frequency = forms.ChoiceField(
         choices=RecurringExpense.Frequency.choices,
         widget=forms.Select(attrs={'class': 'form-control'})
@@ -35,7 +59,7 @@ class RecurringExpenseForm(forms.ModelForm):
 
     class Meta:
         model = RecurringExpense
-        fields = ['amount', 'date', 'description', 'frequency', 'start_date', 'end_date']
+        fields = ['amount', 'currency', 'date', 'description', 'frequency', 'start_date', 'end_date']
         widgets = {
             'start_date': forms.DateInput(attrs={'type': 'date'}),
             'end_date': forms.DateInput(attrs={'type': 'date'}),
@@ -51,4 +75,180 @@ class RecurringExpenseForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
-        super().__init__(*args, **kwargs)
\ No newline at end of file
+        super().__init__(*args, **kwargs)
+
+class ExpenseExportForm(forms.Form):
+    DATE_FIELD = 'date'
+
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    category = forms.CharField(required=False, max_length=30)
+    compress = forms.ChoiceField(required=False, choices=[('', 'None'), ('gzip', 'Gzip')])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError("Start date must be on or before the end date.")
+        return cleaned_data
+
+    def filter(self, queryset):
+        if self.cleaned_data.get('start'):
+            queryset = queryset.filter(**{f'{self.DATE_FIELD}__gte': self.cleaned_data['start']})
+        if self.cleaned_data.get('end'):
+            queryset = queryset.filter(**{f'{self.DATE_FIELD}__lte': self.cleaned_data['end']})
+        if self.cleaned_data.get('category'):
+            queryset = queryset.filter(category=self.cleaned_data['category'])
+        return queryset
+
+
+class ExpenseListForm(ExpenseExportForm):
+    FIELDS = ('id', 'date', 'category', 'amount', 'currency', 'description', 'recurring_id')
+    LIMIT = 50
+
+    compress = None
+    limit = forms.IntegerField(required=False, min_value=1, max_value=200)
+    cursor = forms.CharField(required=False, max_length=40)
+    min_amount = forms.DecimalField(required=False, max_digits=10, decimal_places=2)
+    max_amount = forms.DecimalField(required=False, max_digits=10, decimal_places=2)
+    fields = forms.CharField(required=False, max_length=200)
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        try:
+            day, pk = cursor.split(':')
+            return datetime.date.fromisoformat(day), int(pk)
+        except ValueError:
+            raise forms.ValidationError("Invalid cursor.")
+
+    def clean_fields(self):
+        names = [name.strip() for name in self.cleaned_data['fields'].split(',') if name.strip()]
+        unknown = set(names) - set(self.FIELDS)
+        if unknown:
+            raise forms.ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+        # The next cursor is built from id and the date, so they are always sent.
+        return list(dict.fromkeys(['id', self.DATE_FIELD, *(names or self.FIELDS)]))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        low, high = cleaned_data.get('min_amount'), cleaned_data.get('max_amount')
+        if low is not None and high is not None and low > high:
+            raise forms.ValidationError("min_amount must not exceed max_amount.")
+        return cleaned_data
+
+    def filter(self, queryset):
+        queryset = super().filter(queryset)
+        if self.cleaned_data.get('min_amount') is not None:
+            queryset = queryset.filter(amount__gte=self.cleaned_data['min_amount'])
+        if self.cleaned_data.get('max_amount') is not None:
+            queryset = queryset.filter(amount__lte=self.cleaned_data['max_amount'])
+        if self.cleaned_data.get('cursor'):
+            # Keyset on (date, id). The outer <= bound is redundant but lets the
+            # database seek into the index instead of walking every newer row.
+            day, pk = self.cleaned_data['cursor']
+            queryset = queryset.filter(
+                Q(**{f'{self.DATE_FIELD}__lt': day}) | Q(pk__lt=pk), **{f'{self.DATE_FIELD}__lte': day}
+            )
+        return queryset.order_by(f'-{self.DATE_FIELD}', '-pk')
+
+    def page(self, queryset):
+        # One row past the limit tells whether there is a next page.
+        limit = self.cleaned_data['limit'] or self.LIMIT
+        return self.filter(queryset).values(*self.cleaned_data['fields'])[:limit + 1]
+
+    def next_page(self, rows):
+        limit = self.cleaned_data['limit'] or self.LIMIT
+        if len(rows) <= limit:
+            return rows, None
+        last = rows[limit - 1]
+        return rows[:limit], f"{last[self.DATE_FIELD].isoformat()}:{last['id']}"
+
+
+class RecurringListForm(ExpenseListForm):
+    DATE_FIELD = 'start_date'
+    FIELDS = ('id', 'category', 'amount', 'currency', 'description', 'frequency', 'start_date', 'end_date')
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(max_length=200)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=50)
+
+
+class FeedForm(forms.Form):
+    cursor = forms.CharField(required=False, max_length=64)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=100)
+
+
+class FriendForm(forms.Form):
+    username = forms.CharField(max_length=150)
+    accept = forms.BooleanField(required=False)
+    remove = forms.BooleanField(required=False)
+
+    def clean_username(self):
+        try:
+            return User.objects.get(username=self.cleaned_data['username'])
+        except User.DoesNotExist:
+            raise forms.ValidationError("No such user.")
+
+
+class LeaderboardForm(forms.Form):
+    LIMIT = 10
+
+    board = forms.ChoiceField(choices=[
+        ('streak', 'Logging streak'), ('logs', 'Expenses logged'), ('goals', 'Savings goals met'),
+    ])
+    scope = forms.ChoiceField(required=False, choices=[('friends', 'Friends'), ('global', 'Everyone')])
+    limit = forms.IntegerField(required=False, min_value=1, max_value=100)
+
+
+class ChangesForm(forms.Form):
+    cursor = forms.CharField(required=False, max_length=64)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=1000)
+
+
+class ExpenseImportForm(forms.Form):
+    statement = forms.FileField()
+    format = forms.ChoiceField(required=False, choices=[('', 'Detect'), ('csv', 'CSV'), ('ofx', 'OFX')])
+
+    def statement_format(self):
+        return self.cleaned_data['format'] or detect_format(self.cleaned_data['statement'].name)
+
+
+class SummaryWindowForm(forms.Form):
+    PERIODS = {
+        'week': AnalyticsCache.ReportType.WEEKLY,
+        'month': AnalyticsCache.ReportType.MONTHLY,
+        'year': AnalyticsCache.ReportType.YEARLY,
+    }
+
+    period = forms.ChoiceField(required=False, choices=[(key, key.title()) for key in PERIODS])
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if bool(start) != bool(end):
+            raise forms.ValidationError("Pass both start and end, or neither.")
+        if start and end and start > end:
+            raise forms.ValidationError("Start date must be on or before the end date.")
+        return cleaned_data
+
+    def window(self, today):
+        if self.cleaned_data.get('start'):
+            return self.cleaned_data['start'], self.cleaned_data['end']
+        report_type = self.PERIODS[self.cleaned_data.get('period') or 'month']
+        return period_bounds(report_type, today)
+
+
+class StatementForm(forms.Form):
+    MONTHS = 12
+
+    months = forms.IntegerField(required=False, min_value=1, max_value=60)
+
+
+class TrendForm(forms.Form):
+    granularity = forms.ChoiceField(required=False, choices=[('week', 'Weekly'), ('month', 'Monthly')])
+    periods = forms.IntegerField(required=False, min_value=2, max_value=104)
@@ -0,0 +1,224 @@
+import csv
+import datetime
+import hashlib
+import io
+import re
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import achievements, rollups
+from .currency import CODE, RATES, CurrencyError, fill_base_amounts, preferred
+from .models import Expense, MonthlyStatement
+
+BATCH_SIZE = 500
+MAX_ERRORS = 50
+CENT = Decimal('0.01')
+MAX_AMOUNT = Decimal('99999999.99')
+
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'txn date', 'posted date', 'value date'),
+    'amount': ('amount', 'transaction amount'),
+    # Statements with separate columns fill debit on money out and leave it empty on credits.
+    'debit': ('debit', 'debit amount', 'withdrawal', 'withdrawal amount', 'withdrawal amt.', 'paid out'),
+    'description': ('description', 'narration', 'details', 'particulars', 'memo', 'payee'),
+    'category': ('category',),
+    'currency': ('currency', 'ccy', 'currency code'),
+    'reference': ('reference', 'ref', 'ref no', 'ref no./cheque no.', 'transaction id', 'fitid'),
+}
+OFX_FIELDS = {
+    'DTPOSTED': 'date',
+    'TRNAMT': 'amount',
+    'NAME': 'description',
+    'MEMO': 'memo',
+    'FITID': 'reference',
+}
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%d %b %Y', '%Y%m%d')
+
+
+class StatementError(ValueError):
+    pass
+
+
+def detect_format(filename):
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+
+def open_text(fileobj):
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def parse_csv(stream):
+    reader = csv.DictReader(stream)
+    headers = {name.strip().lower(): name for name in reader.fieldnames or [] if name}
+    columns = {}
+    for key, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[key] = headers[alias]
+                break
+    if 'date' not in columns or not {'amount', 'debit'} & set(columns):
+        raise StatementError("The CSV needs at least a date and an amount or debit column.")
+    if 'debit' in columns:
+        columns.pop('amount', None)
+
+    for row in reader:
+        yield reader.line_num, {key: (row.get(column) or '').strip() for key, column in columns.items()}
+
+
+def parse_ofx(stream):
+    current, start_line = None, 0
+    for line_no, line in enumerate(stream, 1):
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    memo = current.pop('memo', '')
+                    if memo and memo != current.get('description'):
+                        current['description'] = f"{current.get('description', '')} {memo}".strip()
+                    yield start_line, current
+                    current = None
+                elif not closing:
+                    current, start_line = {}, line_no
+            elif current is not None and not closing and tag in OFX_FIELDS:
+                current[OFX_FIELDS[tag]] = value.strip()
+
+
+def parse_date(value):
+    value = value.strip()
+    if len(value) > 8 and value[:8].isdigit():
+        # OFX timestamps look like 20240105120000[-5:EST]; only the day matters.
+        value = value[:8]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise StatementError(f"Unrecognised date {value!r}.")
+
+
+def parse_amount(value):
+    value = value.strip()
+    negative = value.startswith('(') and value.endswith(')')
+    cleaned = re.sub(r'[^\d.\-]', '', value)
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise StatementError(f"Invalid amount {value!r}.")
+    return -amount if negative else amount
+
+
+def parse_currency(value, day):
+    currency = value.strip().upper()
+    if not CODE.match(currency):
+        raise StatementError(f"Invalid currency {value!r}.")
+    try:
+        RATES.rate(currency, day)
+    except CurrencyError as exc:
+        raise StatementError(str(exc))
+    return currency
+
+
+def signed(rows):
+    # A signed amount column with any negatives is a statement: minus is money out.
+    return any(raw.get('amount', '').startswith(('-', '(')) for _, raw in rows)
+
+
+def clean_row(raw, currency, debits_only=False):
+    if 'debit' in raw:
+        if not raw['debit']:
+            return None
+        amount = parse_amount(raw['debit'])
+    else:
+        amount = parse_amount(raw.get('amount', ''))
+        if debits_only:
+            # Only money going out is an expense.
+            if amount >= 0:
+                return None
+    amount = abs(amount).quantize(CENT)
+    if not amount:
+        return None
+    if amount > MAX_AMOUNT:
+        raise StatementError("Amount is too large.")
+    day = parse_date(raw.get('date', ''))
+    return {
+        'date': day,
+        'amount': amount,
+        'currency': parse_currency(raw.get('currency') or currency, day),
+        'category': (raw.get('category') or 'Others')[:30],
+        'description': raw.get('description', ''),
+    }
+
+
+def content_hash(row, reference, occurrence):
+    # The occurrence number keeps genuinely repeated rows (two identical coffees
+    # on one day) while a re-upload of the same file still maps onto the same hashes.
+    key = f"{row['date']}|{row['amount']}|{row['category']}|{row['description']}|{reference}|{occurrence}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _flush(user, batch, result):
+    hashes = [row['import_hash'] for row in batch]
+    with transaction.atomic():
+        existing = set(
+            Expense.objects.filter(user=user, import_hash__in=hashes).values_list('import_hash', flat=True)
+        )
+        expenses = [Expense(user=user, **row) for row in batch if row['import_hash'] not in existing]
+        Expense.objects.bulk_create(fill_base_amounts(expenses))
+        MonthlyStatement.reopen(user.pk, [expense.date for expense in expenses])
+    result['created'] += len(expenses)
+    result['duplicates'] += len(batch) - len(expenses)
+    result['categories'].update(expense.category for expense in expenses)
+
+
+def finish_import(user, result):
+    # Side effects that the per-expense path runs on every save, done once per import.
+    with transaction.atomic():
+        rollups.rebuild_user(user.pk)
+        profile = achievements.locked_profile(user)
+        result['achievements'] = achievements.record_logs(profile, result['created'], result['categories'])
+
+
+def import_statement(user, stream, fmt='csv', batch_size=BATCH_SIZE):
+    result = {'created': 0, 'duplicates': 0, 'skipped': 0, 'invalid': 0, 'errors': [], 'categories': set()}
+    if fmt == 'ofx':
+        rows, debits_only = parse_ofx(stream), True
+    else:
+        # Read ahead once: a file of only positive amounts is a plain list of expenses.
+        start = stream.tell()
+        debits_only = signed(parse_csv(stream))
+        stream.seek(start)
+        rows = parse_csv(stream)
+    occurrences = Counter()
+    batch = []
+    currency = preferred(user)
+
+    for line_no, raw in rows:
+        try:
+            row = clean_row(raw, currency, debits_only)
+        except StatementError as exc:
+            result['invalid'] += 1
+            if len(result['errors']) < MAX_ERRORS:
+                result['errors'].append({'line': line_no, 'error': str(exc)})
+            continue
+        if row is None:
+            result['skipped'] += 1
+            continue
+
+        reference = raw.get('reference', '')
+        base = content_hash(row, reference, 0)
+        occurrences[base] += 1
+        row['import_hash'] = content_hash(row, reference, occurrences[base])
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _flush(user, batch, result)
+            batch = []
+
+    if batch:
+        _flush(user, batch, result)
+    if result['created']:
+        finish_import(user, result)
+    result['categories'] = sorted(result['categories'])
+    return result
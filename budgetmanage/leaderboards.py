@@ -0,0 +1,144 @@
+import bisect
+import datetime
+from functools import partial
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+
+from accounts.models import Friendship, LeaderboardBucket, UserProfile
+from .caching import cached_for_user, invalidate_user
+
+BOARDS = {
+    'streak': 'streak_count',
+    'logs': 'total_logs',
+    'goals': 'goals_met',
+}
+TOP = 100
+# How long a board snapshot or a friends ranking may trail the counters, in seconds.
+TIMEOUT = 60
+BATCH_SIZE = 1000
+
+
+def moves(board, old, new):
+    return [(board, old, -1), (board, new, 1)] if old != new else []
+
+
+def apply(deltas):
+    """Add ``(board, score, delta)`` changes to the buckets in one upsert."""
+    merged = {}
+    for board, score, delta in deltas:
+        if score > 0:
+            merged[board, score] = merged.get((board, score), 0) + delta
+    rows = sorted((key, delta) for key, delta in merged.items() if delta)
+    if not rows:
+        return
+    table = connection.ops.quote_name(LeaderboardBucket._meta.db_table)
+    # Sorted, so concurrent writers lock shared buckets in the same order.
+    values = ', '.join(['(%s, %s, %s)'] * len(rows))
+    params = [value for (board, score), delta in rows for value in (board, score, delta)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (board, score, users) VALUES {values} "
+            f"ON CONFLICT (board, score) DO UPDATE SET users = {table}.users + excluded.users",
+            params,
+        )
+
+
+def moved(deltas):
+    # Every user shares the bucket rows, so their locks stay out of the caller's transaction.
+    transaction.on_commit(partial(apply, list(deltas)))
+
+
+def expire_streaks(today, batch_size=BATCH_SIZE):
+    """Zero the streaks of users who logged nothing yesterday, so broken streaks leave the board."""
+    lapsed = UserProfile.objects.filter(streak_count__gt=0, last_log_date__lt=today - datetime.timedelta(days=1))
+    expired = 0
+    while True:
+        with transaction.atomic():
+            batch = list(lapsed.select_for_update().order_by('pk').values_list('pk', 'user_id', 'streak_count')[:batch_size])
+            if not batch:
+                return expired
+            UserProfile.objects.filter(pk__in=[pk for pk, _, _ in batch]).update(streak_count=0)
+            moved(('streak', streak, -1) for _, _, streak in batch)
+            for _, user_id, _ in batch:
+                invalidate_user(user_id)
+        expired += len(batch)
+
+
+def rebuild():
+    """Recount every bucket from the profiles, after counters were written around moved()."""
+    with transaction.atomic():
+        LeaderboardBucket.objects.all().delete()
+        LeaderboardBucket.objects.bulk_create(
+            [
+                LeaderboardBucket(board=board, score=score, users=users)
+                for board, field in BOARDS.items()
+                for score, users in UserProfile.objects.filter(**{f'{field}__gt': 0})
+                .values_list(field).annotate(users=Count('id')).order_by()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+    cache.delete_many([f"leaderboard:{board}" for board in BOARDS])
+
+
+def _snapshot(board):
+    field = BOARDS[board]
+    buckets = list(
+        LeaderboardBucket.objects.filter(board=board, users__gt=0).order_by('score').values_list('score', 'users')
+    )
+    # at_least[i]: users scoring scores[i] or more.
+    at_least = [0] * (len(buckets) + 1)
+    for i in range(len(buckets) - 1, -1, -1):
+        at_least[i] = at_least[i + 1] + buckets[i][1]
+    top = list(
+        UserProfile.objects.filter(**{f'{field}__gt': 0})
+        .order_by(f'-{field}', 'user_id').values_list('user_id', 'user__username', field)[:TOP]
+    )
+    return {'scores': [score for score, _ in buckets], 'at_least': at_least, 'top': top}
+
+
+def snapshot(board):
+    key = f"leaderboard:{board}"
+    data = cache.get(key)
+    if data is None:
+        data = _snapshot(board)
+        cache.set(key, data, TIMEOUT)
+    return data
+
+
+def rank(data, score):
+    # One more than the users in strictly higher buckets; equal scores share a rank.
+    return 1 + data['at_least'][bisect.bisect_right(data['scores'], score)]
+
+
+def _entry(position, user_id, username, score):
+    return {'rank': position, 'user': {'id': user_id, 'username': username}, 'score': score}
+
+
+def _friends_ranking(user_id, board):
+    field = BOARDS[board]
+    following = Friendship.objects.filter(user_id=user_id, accepted_at__isnull=False).values('friend_id')
+    rows = (
+        UserProfile.objects.filter(user_id=user_id) | UserProfile.objects.filter(user_id__in=following)
+    ).order_by(f'-{field}', 'user_id').values_list('user_id', 'user__username', field)
+    ranking, position, previous = [], 0, None
+    for i, (friend_id, username, score) in enumerate(rows, 1):
+        if score != previous:
+            position, previous = i, score
+        ranking.append(_entry(position, friend_id, username, score))
+    return ranking
+
+
+def standings(user, board, scope, limit):
+    """The top ``limit`` of ``board`` among everyone or the user's friends, and the user's own place."""
+    if scope == 'global':
+        data = snapshot(board)
+        score = getattr(user.profile, BOARDS[board])
+        entries = [_entry(rank(data, s), user_id, username, s) for user_id, username, s in data['top'][:limit]]
+        me = _entry(rank(data, score), user.pk, user.username, score)
+    else:
+        ranking = cached_for_user(user.pk, f"leaderboard:{board}", lambda: _friends_ranking(user.pk, board), TIMEOUT)
+        entries = ranking[:limit]
+        me = next(entry for entry in ranking if entry['user']['id'] == user.pk)
+    return {'board': board, 'scope': scope, 'entries': entries, 'me': me}
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserProfile
+from budgetmanage import achievements, leaderboards
+
+
+class Command(BaseCommand):
+    help = "Recompute achievement counters from existing expenses and award historical achievements."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.order_by('pk')
+        last_pk, users, awards = 0, 0, 0
+        while True:
+            batch = list(profiles.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            awards += achievements.backfill(batch)
+            users += len(batch)
+            last_pk = batch[-1].pk
+        leaderboards.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {users} profile(s); {awards} achievement(s) checked or awarded."))
@@ -0,0 +1,95 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections
+from django.test import Client
+
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure request throughput with a new database connection per request against the "
+        "configured persistent or pooled connections. Meant to run against PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per mode, split across threads.")
+        parser.add_argument('--path', default='/api/dashboard/summary/?period=month')
+        parser.add_argument('--allow-sqlite', action='store_true', help="Run anyway; connecting to SQLite is nearly free.")
+
+    def handle(self, *args, **options):
+        settings_dict = connections.settings['default']
+        if connection.vendor != 'postgresql' and not options['allow_sqlite']:
+            raise CommandError("Point DATABASE_URL at a PostgreSQL server (or pass --allow-sqlite).")
+
+        user = User.objects.create(username=f"bench-{uuid.uuid4().hex}")
+        configured_max_age = settings_dict['CONN_MAX_AGE']
+        pooled = 'pool' in settings_dict.get('OPTIONS', {})
+        try:
+            # Every thread's connection is built from this same settings dict.
+            settings_dict['CONN_MAX_AGE'] = 0
+            if pooled:
+                pool = settings_dict['OPTIONS'].pop('pool')
+            self.run_mode("connect per request", user, options)
+
+            if pooled:
+                settings_dict['OPTIONS']['pool'] = pool
+                label = "pooled"
+            else:
+                max_age = 600 if configured_max_age == 0 else configured_max_age
+                settings_dict['CONN_MAX_AGE'] = max_age
+                label = f"persistent (CONN_MAX_AGE={max_age})"
+            self.run_mode(label, user, options)
+        finally:
+            settings_dict['CONN_MAX_AGE'] = configured_max_age
+            user.delete()
+
+    def run_mode(self, label, user, options):
+        threads = options['threads']
+        per_thread = max(1, options['requests'] // threads)
+        barrier = threading.Barrier(threads + 1)
+        latencies, errors = [], []
+
+        def worker():
+            client = Client()
+            client.force_login(user)
+            mine = []
+            try:
+                barrier.wait()
+                for _ in range(per_thread):
+                    started = time.perf_counter()
+                    response = client.get(options['path'], HTTP_HOST='127.0.0.1')
+                    # The test client skips the request_finished cleanup a real
+                    # server runs, which is exactly what differs between the modes.
+                    close_old_connections()
+                    mine.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise CommandError(f"{options['path']} returned {response.status_code}")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                latencies.extend(mine)
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f"{len(errors)} worker(s) failed, first: {errors[0]}")
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000
+        self.stdout.write(
+            f"{label:>40}: {len(latencies) / elapsed:8.1f} req/s, p50 {p50:.1f} ms, p95 {p95:.1f} ms "
+            f"({len(latencies)} requests, {threads} threads)"
+        )
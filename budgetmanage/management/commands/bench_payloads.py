@@ -0,0 +1,65 @@
+import datetime
+import json
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from budgetmanage.payloads import RollupReport
+
+CATEGORIES = ['Food', 'Transport', 'Shopping', 'Entertainment', 'Education', 'Health', 'Bills', 'Others']
+
+
+class Command(BaseCommand):
+    help = "Compare stored size, decode time and single-bucket update cost of the v3 analytics payload against v1 JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=300, help="Expenses folded into each synthetic report.")
+        parser.add_argument('--number', type=int, default=2000, help="Decodes per timing run.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        today = datetime.date.today()
+        for report_type in ('WEEKLY', 'MONTHLY', 'YEARLY'):
+            report = RollupReport.empty(report_type, today)
+            span = (report.period_end - report.period_start).days
+            for _ in range(options['expenses']):
+                day = report.period_start + datetime.timedelta(days=rng.randint(0, span))
+                report.add(day, rng.choice(CATEGORIES), Decimal(rng.randint(100, 20000)) / 100, 1)
+
+            legacy = json.dumps(report.as_dict())
+            compact = report.encode()
+            # v1 parsed the JSON on every .data access; v3 decodes once per instance.
+            json_time = timeit.timeit(lambda: json.loads(legacy), number=options['number'])
+            v3_time = timeit.timeit(lambda: RollupReport.decode(compact, report_type), number=options['number'])
+            dict_time = timeit.timeit(
+                lambda: RollupReport.decode(compact, report_type).as_dict(), number=options['number']
+            )
+
+            # One logged expense: JSON re-dumps the dict, v3 rewrites the records it touched.
+            day, category = report.period_start, CATEGORIES[0]
+
+            def json_update():
+                data = report.as_dict()
+                report.add(day, category, Decimal('1.00'), 1)
+                return json.dumps(data)
+
+            def v3_update():
+                report.add(day, category, Decimal('1.00'), 1)
+                return report.encode()
+
+            def v3_full_update():
+                report.add(day, category, Decimal('1.00'), 1)
+                return report._encode()
+
+            json_update_time = timeit.timeit(json_update, number=options['number'])
+            patch_time = timeit.timeit(v3_update, number=options['number'])
+            full_time = timeit.timeit(v3_full_update, number=options['number'])
+            per = 1e6 / options['number']
+            self.stdout.write(
+                f"{report_type:>7}: json {len(legacy):>5} B {json_time * per:7.1f} us decode "
+                f"{json_update_time * per:7.1f} us update | "
+                f"v3 {len(compact):>5} B {v3_time * per:7.1f} us decode ({dict_time * per:.1f} with as_dict()), "
+                f"{patch_time * per:7.1f} us patched update against {full_time * per:.1f} us re-encoded"
+            )
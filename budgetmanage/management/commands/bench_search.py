@@ -0,0 +1,98 @@
+import datetime
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import User
+from budgetmanage import search
+from budgetmanage.currency import fill_base_amounts
+from budgetmanage.models import Expense
+
+CATEGORIES = ['Food', 'Transport', 'Shopping', 'Entertainment', 'Education', 'Health', 'Bills', 'Others']
+WORDS = (
+    'coffee tea lunch dinner breakfast groceries vegetables fruit milk bread snacks canteen mess '
+    'bus metro auto cab train fuel parking toll ticket pass recharge mobile internet wifi electricity '
+    'rent hostel laundry books stationery notebook printout xerox course fees exam library gym '
+    'medicine pharmacy doctor clinic movie concert netflix spotify games party gift birthday '
+    'shoes shirt jeans jacket bag charger earphones laptop repair haircut salon donation trip'
+).split()
+QUERIES = ('coffee', 'co', 'metro pass', 'laptop repair', 'food', 'zzzz')
+
+
+class Command(BaseCommand):
+    help = (
+        "Time ranked full-text search and the admin search over many synthetic expenses, "
+        "against a LIKE scan. All rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000)
+        parser.add_argument('--users', type=int, default=1000, help="Spread the rows over this many users.")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        today = timezone.localdate()
+        self.stdout.write(f"Search index on {connection.vendor}: {'yes' if search.has_index() else 'no (LIKE fallback)'}")
+
+        with transaction.atomic():
+            prefix = uuid.uuid4().hex[:8]
+            users = User.objects.bulk_create([
+                User(username=f"bench-{prefix}-{n}") for n in range(options['users'])
+            ])
+            if not users[0].pk:
+                users = list(User.objects.filter(username__startswith=f"bench-{prefix}-").order_by('pk'))
+
+            started = time.perf_counter()
+            for offset in range(0, options['rows'], options['batch_size']):
+                size = min(options['batch_size'], options['rows'] - offset)
+                owners = rng.integers(0, len(users), size)
+                words = rng.integers(0, len(WORDS), (size, 3))
+                lengths = rng.integers(1, 4, size)
+                categories = rng.integers(0, len(CATEGORIES), size)
+                Expense.objects.bulk_create(fill_base_amounts([
+                    Expense(
+                        user_id=users[owner].pk,
+                        date=today - datetime.timedelta(days=int(offset + n) % 1000),
+                        amount=Decimal(100 + (offset + n) % 5000) / 100,
+                        category=CATEGORIES[category],
+                        description=' '.join(WORDS[word] for word in picks[:length]),
+                    )
+                    for n, (owner, picks, length, category) in enumerate(zip(owners, words, lengths, categories))
+                ]))
+            self.stdout.write(f"Inserted {options['rows']} expenses in {time.perf_counter() - started:.1f}s")
+
+            user_id = users[0].pk
+            expenses = Expense.objects.filter(user_id=user_id)
+            for query in QUERIES:
+                self.report(f"ranked   {query!r}", options['repeat'], lambda: search.ranked(user_id, query))
+                self.report(
+                    f"like     {query!r}", options['repeat'],
+                    lambda: list(search._like(expenses, search.terms(query)).order_by('-date', '-id')[:20]),
+                )
+                self.report(
+                    f"admin    {query!r}", options['repeat'],
+                    lambda: list(
+                        search.filter_matches(Expense.objects.all(), query, search.ADMIN_MATCHES).order_by('-date')[:100]
+                    ),
+                )
+            transaction.set_rollback(True)
+
+    def report(self, label, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f"{label:<26} median {statistics.median(timings):8.1f} ms, "
+            f"p99 {timings[min(len(timings) - 1, int(len(timings) * 0.99))]:8.1f} ms"
+        )
@@ -0,0 +1,61 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from accounts.models import User
+from budgetmanage import achievements, caching
+
+PAGES = ('index', 'auth', 'dashboard', 'add-expense', 'analytics', 'recurring', 'setting', 'profile', 'qr-scanner')
+ANONYMOUS_PAGES = ('index', 'auth')
+
+
+class Command(BaseCommand):
+    help = "Time each page's view and template render, with the user's fragments cold and warm."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username=f"bench-{uuid.uuid4().hex}", first_name="Bench")
+        try:
+            with transaction.atomic():
+                achievements.record_logs(achievements.locked_profile(user), 12, ['Food', 'Transport'])
+            self.stdout.write(f"{'page':<12} {'cold ms':>8} {'warm ms':>8} {'cold q':>7} {'warm q':>7}")
+            for name in PAGES:
+                cold, cold_queries = self.render(name, user, options['repeat'], cold=True)
+                warm, warm_queries = self.render(name, user, options['repeat'], cold=False)
+                self.stdout.write(
+                    f"{name:<12} {cold:>8.2f} {warm:>8.2f} {cold_queries:>7} {warm_queries:>7}"
+                )
+        finally:
+            user.delete()
+
+    def request(self, name, user):
+        path = reverse(name)
+        request = RequestFactory().get(path, HTTP_HOST='127.0.0.1')
+        request.user = AnonymousUser() if name in ANONYMOUS_PAGES else user
+        request.session = {}
+        request.resolver_match = resolve(path)
+        return request
+
+    def render(self, name, user, repeat, cold):
+        timings, queries = [], 0
+        for _ in range(repeat):
+            if cold:
+                # A new generation orphans the user's cached fragments.
+                caching.bump_user(user.pk)
+            request = self.request(name, user)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request.resolver_match.func(request)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(captured.captured_queries)
+            assert response.status_code == 200, (name, response.status_code)
+        return statistics.median(timings), queries
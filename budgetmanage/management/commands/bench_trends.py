@@ -0,0 +1,62 @@
+import datetime
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from budgetmanage.currency import fill_base_amounts
+from budgetmanage.models import Expense
+from budgetmanage.trends import compute_trends
+
+CATEGORIES = ['Food', 'Transport', 'Shopping', 'Entertainment', 'Education', 'Health', 'Bills', 'Others']
+
+
+class Command(BaseCommand):
+    help = "Time trend analytics for one synthetic user with many expenses. All rows are rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=3 * 365, help="Spread the rows over this many days.")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        today = timezone.localdate()
+
+        with transaction.atomic():
+            user = User.objects.create(username=f"bench-{uuid.uuid4().hex}")
+            started = time.perf_counter()
+            for offset in range(0, options['rows'], options['batch_size']):
+                size = min(options['batch_size'], options['rows'] - offset)
+                days = rng.integers(0, options['days'], size)
+                cents = rng.gamma(2.0, 1500.0, size).astype(int) + 1
+                categories = rng.integers(0, len(CATEGORIES), size)
+                Expense.objects.bulk_create(fill_base_amounts([
+                    Expense(
+                        user=user,
+                        date=today - datetime.timedelta(days=int(day)),
+                        amount=Decimal(int(cent)) / 100,
+                        category=CATEGORIES[category],
+                    )
+                    for day, cent, category in zip(days, cents, categories)
+                ]))
+            self.stdout.write(f"Inserted {options['rows']} expenses in {time.perf_counter() - started:.1f}s")
+
+            for granularity, periods in (('week', 52), ('month', 36)):
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    compute_trends(user.pk, granularity, today, periods)
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f"{granularity:>5} x{periods}: median {statistics.median(timings):.1f} ms, "
+                    f"min {min(timings):.1f} ms over {options['repeat']} runs"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,49 @@
+import gzip
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from budgetmanage.assets import BUNDLES, build_bundles, bundle_path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = "Bundle each page's CSS and JS into static/bundles/ and report bytes and requests per page."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiet-report', action='store_true')
+
+    def handle(self, *args, **options):
+        source_dir = settings.STATICFILES_DIRS[0]
+        written = build_bundles(source_dir)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(written)} bundles to {source_dir / 'bundles'}"))
+        if not options['quiet_report']:
+            self.report(source_dir)
+
+    def sizes(self, paths):
+        raw = [(self.source_dir / path).read_bytes() for path in paths]
+        return (
+            sum(len(data) for data in raw),
+            sum(len(gzip.compress(data, 9)) for data in raw),
+            sum(len(brotli.compress(data)) for data in raw) if brotli else None,
+        )
+
+    def report(self, source_dir):
+        self.source_dir = source_dir
+        self.stdout.write(
+            f"{'page':<12} {'before: req':>11} {'raw':>8} {'gzip':>8}   {'after: req':>10} {'raw':>8} {'gzip':>8} {'br':>8}"
+        )
+        for page, files in BUNDLES.items():
+            sources = files['css'] + files['js']
+            bundles = [bundle_path(page, 'css'), bundle_path(page, 'js')]
+            before_raw, before_gzip, _ = self.sizes(sources)
+            after_raw, after_gzip, after_br = self.sizes(bundles)
+            self.stdout.write(
+                f"{page:<12} {len(sources):>11} {before_raw:>8} {before_gzip:>8}   "
+                f"{len(bundles):>10} {after_raw:>8} {after_gzip:>8} {after_br if after_br is not None else '-':>8}"
+            )
+        self.stdout.write("Bytes are for the app's own assets; CDN fonts and libraries are unchanged.")
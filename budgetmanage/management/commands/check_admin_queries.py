@@ -0,0 +1,106 @@
+import datetime
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from budgetmanage.currency import fill_base_amounts
+from budgetmanage.models import Expense, RecurringExpense
+
+# Session, user, filter choices, bounded count, date range, page rows and slack
+# for Django's own lookups; the point is that none of them grow with the table.
+ADMIN_BUDGET = 10
+
+
+def seed(users, rows):
+    today = timezone.localdate()
+    Expense.objects.bulk_create(fill_base_amounts([
+        Expense(
+            user=users[n % len(users)], amount=Decimal('1.50'), category=f"cat-{n % 7}",
+            description=f"coffee {n}", date=today - datetime.timedelta(days=n * 3),
+        )
+        for n in range(rows)
+    ]))
+    RecurringExpense.objects.bulk_create([
+        RecurringExpense(
+            user=users[n % len(users)], amount=Decimal('9.99'), category=f"cat-{n % 7}",
+            description=f"plan {n}", frequency=RecurringExpense.Frequency.MONTHLY,
+            start_date=today - datetime.timedelta(days=n * 3),
+        )
+        for n in range(rows)
+    ])
+
+
+def admin_pages(users, expense):
+    changelist = reverse('admin:budgetmanage_expense_changelist')
+    recurring = reverse('admin:budgetmanage_recurringexpense_changelist')
+    today = timezone.localdate()
+    return [
+        ('expenses', changelist),
+        ('expenses page 2', f"{changelist}?p=1"),
+        ('expenses by user', f"{changelist}?user={users[0].pk}"),
+        ('expenses by year', f"{changelist}?date__year={today.year}"),
+        ('expenses by month', f"{changelist}?date__year={today.year}&date__month={today.month}"),
+        ('expenses by category', f"{changelist}?category=cat-1"),
+        ('expense search', f"{changelist}?q=coffee"),
+        ('expense change form', reverse('admin:budgetmanage_expense_change', args=[expense.pk])),
+        ('recurring', recurring),
+        ('recurring by user', f"{recurring}?user={users[0].pk}"),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Check that the expense admin pages run a fixed number of queries however many rows there are."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200, help="Rows added between the two passes.")
+
+    def measure(self, client, users, expense):
+        counts = {}
+        for label, url in admin_pages(users, expense):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, HTTP_HOST='127.0.0.1')
+            if response.status_code != 200:
+                raise CommandError(f"{label} returned {response.status_code} {response.get('Location')}.")
+            counts[label] = len(queries)
+            if self.verbosity > 1:
+                for query in queries.captured_queries:
+                    self.stdout.write(f"    {query['sql'][:160]}")
+        return counts
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        prefix = uuid.uuid4().hex[:8]
+        # Created and deleted rather than rolled back, so the identity cache never sees reused ids.
+        admin = User.objects.create_superuser(f"admin-check-{prefix}", f"{prefix}@example.com", prefix)
+        users = [User.objects.create(username=f"admin-check-{prefix}-{n}") for n in range(5)]
+        try:
+            client = Client()
+            client.force_login(admin)
+            seed(users, 20)
+            expense = Expense.objects.filter(user=users[0]).first()
+            # The first pass warms per-process caches (content types, permissions).
+            self.measure(client, users, expense)
+            before = self.measure(client, users, expense)
+            seed(users, options['rows'])
+            after = self.measure(client, users, expense)
+        finally:
+            for user in [admin, *users]:
+                user.delete()
+
+        failures = []
+        for label, count in after.items():
+            self.stdout.write(f"  {label:<24} {before[label]} -> {count} queries")
+            if count != before[label]:
+                failures.append(f"{label} went from {before[label]} to {count} queries")
+            elif count > ADMIN_BUDGET:
+                failures.append(f"{label} ran {count} queries, budget is {ADMIN_BUDGET}")
+        if failures:
+            raise CommandError("; ".join(failures))
+        self.stdout.write(self.style.SUCCESS(f"All {len(after)} admin pages stay within {ADMIN_BUDGET} queries."))
@@ -0,0 +1,32 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from budgetmanage.statements import BATCH_SIZE, close_month
+
+
+class Command(BaseCommand):
+    help = "Freeze a finished month into per-user statements and award the savings goals it met."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="The month to close (YYYY-MM). Defaults to last month.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        current = timezone.localdate().replace(day=1)
+        if options['month']:
+            try:
+                month = datetime.date.fromisoformat(f"{options['month']}-01")
+            except ValueError:
+                raise CommandError("--month must be a month in YYYY-MM format.")
+            if month >= current:
+                raise CommandError("Only finished months can be closed.")
+        else:
+            month = (current - datetime.timedelta(days=1)).replace(day=1)
+
+        stats = close_month(month, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {month:%Y-%m}: wrote {stats['statements']} statement(s), "
+            f"{stats['goals_met']} savings goal(s) met."
+        ))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from budgetmanage.forms import ExpenseListForm, RecurringListForm
+from budgetmanage.models import Expense, RecurringExpense
+
+
+def list_page(form_class, queryset, **params):
+    form = form_class(params)
+    if not form.is_valid():
+        raise CommandError(form.errors.as_text())
+    return form.page(queryset)
+
+
+def hot_queries(user_id=1):
+    expenses = Expense.objects.filter(user_id=user_id)
+    return [
+        ('export', 'expense_user_date_idx',
+         expenses.order_by('date', 'id').values_list('date', 'category', 'amount', 'description')),
+        ('rollup rebuild', 'expense_user_date_idx',
+         expenses.filter(date__range=('2024-01-01', '2024-12-31'))
+         .values_list('category', 'date').annotate(total=Sum('amount'), count=Count('id')).order_by()),
+        ('category breakdown', 'expense_user_cat_date_idx',
+         expenses.values('category').annotate(total=Sum('amount')).order_by('category')),
+        ('category history', 'expense_user_cat_date_idx',
+         expenses.filter(category='Food').order_by('-date')),
+        ('import dedupe', 'expense_user_import_hash_idx',
+         expenses.filter(import_hash__in=['a' * 64, 'b' * 64]).values_list('import_hash', flat=True)),
+        ('recurring list', 'recurring_user_start_idx',
+         RecurringExpense.objects.filter(user_id=user_id).order_by('start_date')),
+        ('expense page', 'expense_user_date_idx',
+         list_page(ExpenseListForm, expenses, cursor='2024-06-01:5000', min_amount='1')),
+        ('category page', 'expense_user_cat_date_idx',
+         list_page(ExpenseListForm, expenses, cursor='2024-06-01:5000', category='Food', fields='amount')),
+        ('recurring page', 'recurring_user_start_idx',
+         list_page(RecurringListForm, RecurringExpense.objects.filter(user_id=user_id), cursor='2024-06-01:50')),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Print EXPLAIN output for the expense hot paths and fail if an expected index is not used."
+
+    def handle(self, *args, **options):
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small or empty tables would otherwise be planned as sequential scans.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for label, index, queryset in hot_queries():
+                plan = queryset.explain()
+                used = index in plan
+                if not used:
+                    failures.append(f"{label} does not use {index}")
+                self.stdout.write(f"== {label} ({'uses' if used else 'MISSING'} {index})")
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError("; ".join(failures))
+        self.stdout.write(self.style.SUCCESS(f"All {len(hot_queries())} queries use their index on {connection.vendor}."))
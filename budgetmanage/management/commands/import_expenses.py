@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from budgetmanage.imports import BATCH_SIZE, StatementError, detect_format, import_statement, open_text
+
+
+class Command(BaseCommand):
+    help = "Import a bank statement (CSV or OFX) into a user's expenses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ofx'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+
+        fmt = options['format'] or detect_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                result = import_statement(user, open_text(fileobj), fmt=fmt, batch_size=options['batch_size'])
+        except (OSError, StatementError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']}, skipped {result['duplicates']} duplicate(s), "
+            f"{result['skipped']} non-expense row(s) and {result['invalid']} invalid row(s)."
+        ))
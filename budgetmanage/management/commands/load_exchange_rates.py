@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from budgetmanage.currency import BASE_CURRENCY, CurrencyError, load_rates, read_rates
+from budgetmanage.imports import open_text
+
+
+class Command(BaseCommand):
+    help = (
+        f"Load exchange rates to {BASE_CURRENCY} from a date,currency,rate CSV file "
+        "and re-price the expenses they apply to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                rates = read_rates(open_text(fileobj))
+        except (OSError, CurrencyError) as e:
+            raise CommandError(str(e))
+
+        users = load_rates(rates)
+        currencies = sorted({code for code, _ in rates})
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {len(rates)} rate(s) for {', '.join(currencies) or 'no currencies'}; "
+            f"re-priced expenses of {len(users)} user(s)."
+        ))
@@ -0,0 +1,140 @@
+import datetime
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.utils import timezone
+
+from accounts.models import User
+from budgetmanage.currency import fill_base_amounts
+from budgetmanage.models import Expense
+
+ENDPOINTS = (
+    'dashboard/summary/?period=month',
+    'analytics/trends/?granularity=month&periods=12',
+    'expenses/?limit=50',
+    'profile/',
+)
+CATEGORIES = ['Food', 'Transport', 'Shopping', 'Entertainment', 'Education', 'Health', 'Bills', 'Others']
+
+
+class Command(BaseCommand):
+    help = (
+        "Start uvicorn with N workers and compare p50/p99 latency and requests/sec of the async "
+        "read-only API against its /api/sync/ twins."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per endpoint and variant.")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--expenses', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username=f"loadtest-{uuid.uuid4().hex}")
+        server = None
+        try:
+            self.seed(user, options['expenses'])
+            client = Client()
+            client.force_login(user)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+            server = subprocess.Popen(
+                [
+                    sys.executable, '-m', 'uvicorn', 'budgetmanage.asgi:application',
+                    '--workers', str(options['workers']), '--port', str(options['port']),
+                    '--log-level', 'warning', '--no-access-log',
+                ],
+                cwd=settings.BASE_DIR,
+                env=os.environ.copy(),
+            )
+            self.wait_for_port(options['port'])
+
+            self.stdout.write(
+                f"uvicorn --workers {options['workers']}, {options['concurrency']} connections, "
+                f"{options['duration']:.0f}s per run"
+            )
+            for endpoint in ENDPOINTS:
+                for variant, prefix in (('sync', '/api/sync/'), ('async', '/api/')):
+                    result = self.run(prefix + endpoint, cookie, options)
+                    self.stdout.write(
+                        f"{variant:>5} {endpoint:<48} {result['rps']:8.1f} req/s  "
+                        f"p50 {result['p50']:7.1f} ms  p99 {result['p99']:7.1f} ms  errors {result['errors']}"
+                    )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+            user.delete()
+
+    def seed(self, user, count):
+        today = timezone.localdate()
+        Expense.objects.bulk_create(fill_base_amounts([
+            Expense(
+                user=user,
+                amount=Decimal(100 + n % 900) / 100,
+                category=CATEGORIES[n % len(CATEGORIES)],
+                date=today - datetime.timedelta(days=n % 365),
+            )
+            for n in range(count)
+        ]))
+
+    def wait_for_port(self, port, timeout=20):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"uvicorn did not start listening on port {port}.")
+
+    def run(self, path, cookie, options):
+        headers = {'Cookie': cookie, 'Host': '127.0.0.1'}
+        deadline = time.monotonic() + options['duration']
+        latencies, errors = [], []
+
+        def worker():
+            connection = http.client.HTTPConnection('127.0.0.1', options['port'], timeout=30)
+            mine, failed = [], 0
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    mine.append(time.perf_counter() - started)
+                    if response.status != 200:
+                        failed += 1
+            finally:
+                connection.close()
+                latencies.extend(mine)
+                errors.append(failed)
+
+        started = time.monotonic()
+        workers = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        if not latencies:
+            raise CommandError(f"No request to {path} completed.")
+        latencies.sort()
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': latencies[len(latencies) // 2] * 1000,
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+            'errors': sum(errors),
+        }
@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budgetmanage.recurrences import BATCH_SIZE, materialize_all
+
+
+class Command(BaseCommand):
+    help = "Write every due recurring-expense occurrence to the expense table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help="Materialize occurrences up to this date (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=1, help="Shard users across this many processes.")
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            try:
+                until = datetime.date.fromisoformat(options['until'])
+            except ValueError:
+                raise CommandError("--until must be a date in YYYY-MM-DD format.")
+
+        stats = materialize_all(until, options['batch_size'], options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']} expense(s) from {stats['recurrences']} due recurrence(s)."
+        ))
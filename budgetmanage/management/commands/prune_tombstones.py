@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from budgetmanage.models import Tombstone
+from budgetmanage.sync import TOMBSTONE_RETENTION
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sync tombstones older than the retention window. Clients whose cursor "
+        "predates it are told to sync again from scratch."
+    )
+
+    def handle(self, *args, **options):
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} tombstone(s)."))
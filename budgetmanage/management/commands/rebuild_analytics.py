@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from budgetmanage import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached weekly/monthly/yearly analytics reports from the expense table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help="Only rebuild reports for this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        user_ids = options['users'] or User.objects.order_by('pk').values_list('pk', flat=True).iterator()
+        rebuilt = 0
+        for user_id in user_ids:
+            rollups.rebuild_user(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt analytics for {rebuilt} user(s)."))
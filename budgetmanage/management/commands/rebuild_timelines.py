@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from budgetmanage.feed import BATCH_SIZE, rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = "Refill every user's feed timeline from the activity table after turning on ACTIVITY_FANOUT."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not settings.ACTIVITY_FANOUT:
+            raise CommandError("ACTIVITY_FANOUT is off, so feeds are read from the activity table directly.")
+        written = rebuild_timelines(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Fanned out {written} activity row(s)."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from budgetmanage import leaderboards
+
+
+class Command(BaseCommand):
+    help = "Drop broken logging streaks from the leaderboards. Run daily, after midnight."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=leaderboards.BATCH_SIZE)
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help="Also recount every leaderboard bucket from the profiles.",
+        )
+
+    def handle(self, *args, **options):
+        expired = leaderboards.expire_streaks(timezone.localdate(), options['batch_size'])
+        if options['rebuild']:
+            leaderboards.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {expired} streak(s)" + ("; rebuilt the leaderboards." if options['rebuild'] else ".")
+        ))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetmanage', '0002_expense_import_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='recurring',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='budgetmanage.recurringexpense'),
+        ),
+        migrations.AddField(
+            model_name='recurringexpense',
+            name='materialized_through',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetmanage', '0005_sync_tracking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_user_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_user_cat_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recurringexpense',
+            name='recurring_user_start_idx',
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date', 'id'], name='expense_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'category', 'date', 'id'], name='expense_user_cat_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringexpense',
+            index=models.Index(fields=['user', 'start_date', 'id'], name='recurring_user_start_idx'),
+        ),
+    ]
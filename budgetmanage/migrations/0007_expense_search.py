@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+from budgetmanage.search import FTS_TABLE, POSTGRES_SCHEMA, SQLITE_TRIGGERS, install_sqlite
+
+
+def forward(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for sql in POSTGRES_SCHEMA:
+            schema_editor.execute(sql)
+    elif connection.vendor == 'sqlite':
+        try:
+            install_sqlite(connection)
+        except OperationalError as e:
+            # SQLite builds without FTS5 keep working; search falls back to LIKE.
+            if 'fts5' not in str(e):
+                raise
+
+
+def backward(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS expense_search_idx")
+        schema_editor.execute("ALTER TABLE budgetmanage_expense DROP COLUMN IF EXISTS search_vector")
+    elif connection.vendor == 'sqlite':
+        for name in SQLITE_TRIGGERS:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetmanage', '0006_keyset_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, backward),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:31
+
+import re
+
+import budgetmanage.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def stamp_currencies(apps, schema_editor):
+    # Amounts so far were entered in each owner's preferred currency (USD by
+    # default), not in BASE_CURRENCY. Label them with it; rows in any other
+    # currency keep base_amount = amount until load_exchange_rates prices them.
+    Expense = apps.get_model('budgetmanage', 'Expense')
+    RecurringExpense = apps.get_model('budgetmanage', 'RecurringExpense')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    Expense.objects.update(base_amount=F('amount'))
+    for preferred in UserProfile.objects.values_list('preferred_currency', flat=True).distinct():
+        code = preferred.strip().upper()
+        if not re.match(r'^[A-Z]{3}$', code) or code == settings.BASE_CURRENCY:
+            continue
+        for model in (Expense, RecurringExpense):
+            model.objects.filter(user__profile__preferred_currency=preferred).update(currency=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_achievement_userprofile_useractivity'),
+        ('budgetmanage', '0008_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='base_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='currency',
+            field=models.CharField(default=budgetmanage.models.base_currency, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='recurringexpense',
+            name='currency',
+            field=models.CharField(default=budgetmanage.models.base_currency, max_length=3),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('currency', 'date'), name='exchange_rate_currency_date_uniq')],
+            },
+        ),
+        migrations.RunPython(stamp_currencies, migrations.RunPython.noop),
+    ]
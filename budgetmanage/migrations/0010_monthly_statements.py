@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetmanage', '0009_currency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('currency', models.CharField(max_length=3)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('count', models.PositiveIntegerField()),
+                ('data', models.TextField(editable=False)),
+                ('goal', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('goal_met', models.BooleanField(null=True)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='statements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'id'], name='statement_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='statement_user_month_uniq')],
+            },
+        ),
+    ]
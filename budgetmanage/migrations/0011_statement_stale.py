@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetmanage', '0010_monthly_statements'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlystatement',
+            name='stale',
+            field=models.BooleanField(default=False),
+        ),
+    ]
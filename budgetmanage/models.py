@@ -1,18 +1,74 @@
-import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 from accounts.models import User
 from django.utils import timezone
+from .payloads import RollupReport
+
+
+def base_currency():
+    return settings.BASE_CURRENCY
+
+
+def check_rate(currency, day):
+    from .currency import CurrencyError, RATES
+
+    if not currency or day is None:
+        return
+    try:
+        RATES.rate(currency, day)
+    except CurrencyError as e:
+        raise ValidationError({'currency': str(e)})
 
 
 class Expense(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses')
+    # Every composite index below leads with user, so the plain FK index is redundant.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses', db_index=False)
     category = models.CharField(max_length=30, default="Others")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default=base_currency)
+    # amount in settings.BASE_CURRENCY at the expense date's rate, set on save;
+    # totals sum this column. bulk_create() callers fill it with currency.fill_base_amounts().
+    base_amount = models.DecimalField(max_digits=14, decimal_places=2, editable=False)
     description = models.TextField(blank=True)
     date = models.DateField(default=timezone.now)
+    import_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    recurring = models.ForeignKey(
+        'RecurringExpense', on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences'
+    )
+    # Sync cursors page through this; QuerySet.update() callers must set it themselves.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # id is the keyset tie-breaker for the list API's (date, id) cursors.
+            models.Index(fields=['user', 'date', 'id'], name='expense_user_date_idx'),
+            models.Index(fields=['user', 'category', 'date', 'id'], name='expense_user_cat_date_idx'),
+            models.Index(fields=['user', 'import_hash'], name='expense_user_import_hash_idx'),
+            models.Index(fields=['user', 'updated_at'], name='expense_user_updated_idx'),
+            # Admin changelist across all users: ordering, date drilldown and the category filter.
+            models.Index(fields=['date', 'id'], name='expense_date_idx'),
+            models.Index(fields=['category', 'date', 'id'], name='expense_category_date_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.amount} on {self.category}"
+        return f"{self.amount} on {self.category} ({self.date})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so rollups can subtract it on edit/delete.
+        if not instance.get_deferred_fields() & {'user_id', 'date', 'category', 'base_amount'}:
+            instance._rollup_state = instance.rollup_state()
+        return instance
+
+    def clean(self):
+        check_rate(self.currency, self._meta.get_field('date').to_python(self.date))
+
+    def rollup_state(self):
+        date = self._meta.get_field('date').to_python(self.date)
+        amount = self._meta.get_field('base_amount').to_python(self.base_amount)
+        return (self.user_id, date, self.category, amount)
 
 
 class RecurringExpense(models.Model):
@@ -22,17 +78,121 @@ class RecurringExpense(models.Model):
         MONTHLY = 'MONTHLY', 'Monthly'
         YEARLY = 'YEARLY', 'Yearly'
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_expenses')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_expenses', db_index=False)
     category = models.CharField(max_length=30, default="Others")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default=base_currency)
     description = models.CharField(max_length=200)
     frequency = models.CharField(max_length=10, choices=Frequency.choices)
     date = models.DateField(default=timezone.now)
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
+    # Last occurrence already written to the expense table by the materializer.
+    materialized_through = models.DateField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start_date', 'id'], name='recurring_user_start_idx'),
+            models.Index(fields=['user', 'updated_at'], name='recurring_user_updated_idx'),
+            models.Index(fields=['start_date', 'id'], name='recurring_start_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.get_frequency_display()} - {self.description} for {self.user.username}"
+        return f"{self.get_frequency_display()} - {self.description}"
+
+    def clean(self):
+        check_rate(self.currency, self._meta.get_field('start_date').to_python(self.start_date))
+
+
+class Tombstone(models.Model):
+    """Marks a deleted expense or recurring expense so sync clients can drop it too."""
+
+    class Kind(models.TextChoices):
+        EXPENSE = 'expense', 'Expense'
+        RECURRING = 'recurring', 'Recurring expense'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones', db_index=False)
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id} deleted by {self.user.username}"
+
+
+class ExchangeRate(models.Model):
+    """What one unit of ``currency`` was worth in settings.BASE_CURRENCY from ``date`` on."""
+
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='exchange_rate_currency_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"1 {self.currency} = {self.rate} {settings.BASE_CURRENCY} from {self.date}"
+
+
+class MonthlyStatement(models.Model):
+    """A closed month's totals, categories and goal outcome, written once by the month-close job.
+
+    An expense written into the month afterwards marks the statement stale; the
+    month then reads live again until the next close_month() replaces it.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='statements', db_index=False)
+    month = models.DateField()
+    currency = models.CharField(max_length=3)
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+    count = models.PositiveIntegerField()
+    # The month's RollupReport, encoded like AnalyticsCache.data.
+    data = models.TextField(editable=False)
+    # The savings goal when the month closed; null if none was set.
+    goal = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    goal_met = models.BooleanField(null=True)
+    closed_at = models.DateTimeField(auto_now_add=True)
+    stale = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='statement_user_month_uniq'),
+        ]
+        indexes = [
+            # Which users a month-close run already covered, and the admin's month ordering.
+            models.Index(fields=['month', 'id'], name='statement_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}'s statement for {self.month:%B %Y}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Closed statements cannot be changed.")
+        super().save(*args, **kwargs)
+
+    @property
+    def report(self):
+        return RollupReport.decode(self.data, 'MONTHLY')
+
+    @classmethod
+    def reopen(cls, user_id, days, today=None):
+        """Mark the user's statements for the months of ``days`` stale."""
+        # Only finished months are ever closed, so today's writes skip the query.
+        current = (today or timezone.localdate()).replace(day=1)
+        months = {day.replace(day=1) for day in days if day < current}
+        if months:
+            cls.objects.filter(user_id=user_id, month__in=months, stale=False).update(stale=True)
+
 
 class AnalyticsCache(models.Model):
     class ReportType(models.TextChoices):
@@ -48,16 +208,29 @@ class AnalyticsCache(models.Model):
     class Meta:
         unique_together = ('user', 'report_type')
     
+    @property
+    def report(self):
+        # Decoded once per instance; rollups mutate it in place and save() re-encodes it.
+        if '_report' not in self.__dict__:
+            self._report = RollupReport.decode(self._data, self.report_type) if self._data else None
+        return self._report
+
+    @report.setter
+    def report(self, value):
+        self._report = value
+
     @property
     def data(self):
-        if not self._data:
-            return {}
-        return json.loads(self._data)
+        return self.report.as_dict() if self.report else {}
 
-    # This setter will handle converting the Python dict to a JSON string
     @data.setter
     def data(self, value):
-        self._data = json.dumps(value)
+        self.report = RollupReport.from_dict(value, self.report_type) if value else None
+
+    def save(self, *args, **kwargs):
+        if '_report' in self.__dict__:
+            self._data = self._report.encode() if self._report else ''
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username}'s {self.get_report_type_display()} Analytics"
\ No newline at end of file
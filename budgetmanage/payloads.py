@@ -0,0 +1,273 @@
+import array
+import base64
+import datetime
+import json
+import struct
+import sys
+import zlib
+from decimal import Decimal
+
+# Version 1 was a plain JSON object and version 2 a deflated binary layout
+# (still read). Version 3 is fixed-layout and uncompressed:
+#   header (version, report type, period start/end ordinals, bucket slots,
+#           category count), padded to 15 bytes
+#   records of (int64 cents, int32 count): the report total, one per bucket
+#           slot, one per category
+#   category names joined by \x1f
+# base64'd into the text column. Header and records are multiples of 3 bytes,
+# so record r always starts at a known character offset and a delta rewrites
+# just the records it touched.
+VERSION = 3
+PREFIX = 'v3:'
+HEADER = struct.Struct('<BBIIHHx')
+RECORD = struct.Struct('<qi')
+V2_PREFIX = 'v2:'
+V2_HEADER = struct.Struct('<BBIIqiHH')
+REPORT_TYPES = ('WEEKLY', 'MONTHLY', 'YEARLY')
+NAME_SEPARATOR = '\x1f'
+CENT = Decimal('0.01')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def version(moment):
+    """Microseconds since the epoch: exact, unlike the millisecond ISO strings JSON gets."""
+    return (moment - EPOCH) // MICROSECOND
+
+
+def from_version(value):
+    return EPOCH + value * MICROSECOND
+
+
+def period_bounds(report_type, day):
+    if report_type == 'WEEKLY':
+        start = day - datetime.timedelta(days=day.weekday())
+        return start, start + datetime.timedelta(days=6)
+    if report_type == 'MONTHLY':
+        start = day.replace(day=1)
+        next_month = (start + datetime.timedelta(days=32)).replace(day=1)
+        return start, next_month - datetime.timedelta(days=1)
+    return day.replace(month=1, day=1), day.replace(month=12, day=31)
+
+
+def bucket_key(report_type, day):
+    # Yearly reports are bucketed per month, the others per day.
+    if report_type == 'YEARLY':
+        return day.strftime('%Y-%m')
+    return day.isoformat()
+
+
+def to_cents(amount):
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+def from_cents(cents):
+    return str((Decimal(cents) / 100).quantize(CENT))
+
+
+def _le_array(typecode, data):
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class RollupReport:
+    def __init__(self, report_type, period_start, period_end):
+        self.report_type = report_type
+        self.period_start = period_start
+        self.period_end = period_end
+        self.total = 0
+        self.count = 0
+        slots = self.slot(period_end) + 1
+        self.bucket_totals = array.array('q', bytes(8 * slots))
+        self.bucket_counts = array.array('i', bytes(4 * slots))
+        self.categories = {}
+        self._dict = None
+        # The v3 text this report was decoded from or last encoded to, and what
+        # changed since: record indexes, category names, and whether a category
+        # came or went (which moves the category records and names).
+        self._source = None
+        self._dirty = set()
+        self._dirty_categories = set()
+        self._relayout = False
+
+    @classmethod
+    def empty(cls, report_type, today):
+        return cls(report_type, *period_bounds(report_type, today))
+
+    def slot(self, day):
+        if self.report_type == 'YEARLY':
+            return day.month - 1
+        return (day - self.period_start).days
+
+    def slot_day(self, slot):
+        if self.report_type == 'YEARLY':
+            return self.period_start.replace(month=slot + 1)
+        return self.period_start + datetime.timedelta(days=slot)
+
+    def covers(self, day):
+        return self.period_start <= day <= self.period_end
+
+    def add(self, day, category, amount, count):
+        cents = to_cents(amount)
+        self.total += cents
+        self.count += count
+        slot = self.slot(day)
+        self.bucket_totals[slot] += cents
+        self.bucket_counts[slot] += count
+        self._dirty.update((0, 1 + slot))
+        entry = self.categories.get(category)
+        if entry is None:
+            entry = self.categories[category] = [0, 0]
+            self._relayout = True
+        entry[0] += cents
+        entry[1] += count
+        if entry[1] <= 0:
+            del self.categories[category]
+            self._relayout = True
+        self._dirty_categories.add(category)
+        self._dict = None
+
+    def as_dict(self):
+        if self._dict is None:
+            self._dict = {
+                'period_start': self.period_start.isoformat(),
+                'period_end': self.period_end.isoformat(),
+                'total': from_cents(self.total),
+                'count': self.count,
+                'categories': {
+                    name: {'total': from_cents(cents), 'count': count}
+                    for name, (cents, count) in self.categories.items()
+                },
+                'buckets': {
+                    bucket_key(self.report_type, self.slot_day(slot)): {'total': from_cents(cents), 'count': count}
+                    for slot, (cents, count) in enumerate(zip(self.bucket_totals, self.bucket_counts))
+                    if count
+                },
+            }
+        return self._dict
+
+    @classmethod
+    def from_dict(cls, data, report_type):
+        report = cls(
+            report_type,
+            datetime.date.fromisoformat(data['period_start']),
+            datetime.date.fromisoformat(data['period_end']),
+        )
+        report.total = to_cents(data['total'])
+        report.count = data['count']
+        for name, entry in data['categories'].items():
+            report.categories[name] = [to_cents(entry['total']), entry['count']]
+        for key, entry in data['buckets'].items():
+            day = datetime.date.fromisoformat(f"{key}-01" if report_type == 'YEARLY' else key)
+            slot = report.slot(day)
+            report.bucket_totals[slot] = to_cents(entry['total'])
+            report.bucket_counts[slot] = entry['count']
+        return report
+
+    def records(self):
+        yield self.total, self.count
+        yield from zip(self.bucket_totals, self.bucket_counts)
+        yield from self.categories.values()
+
+    def encode(self):
+        """The v3 text, patched record by record when the layout is unchanged since the last encode."""
+        if self._source is not None and not self._relayout:
+            text = self._patch()
+        else:
+            text = self._encode()
+        self._source = text
+        self._dirty.clear()
+        self._dirty_categories.clear()
+        self._relayout = False
+        return text
+
+    def _encode(self):
+        names = list(self.categories)
+        header = HEADER.pack(
+            VERSION,
+            REPORT_TYPES.index(self.report_type),
+            self.period_start.toordinal(),
+            self.period_end.toordinal(),
+            len(self.bucket_totals),
+            len(names),
+        )
+        blob = b''.join([
+            header,
+            *(RECORD.pack(cents, count) for cents, count in self.records()),
+            NAME_SEPARATOR.join(name.replace(NAME_SEPARATOR, ' ') for name in names).encode('utf-8'),
+        ])
+        return PREFIX + base64.b64encode(blob).decode('ascii')
+
+    def _patch(self):
+        slots = len(self.bucket_totals)
+        changed = {record: (self.total, self.count) for record in self._dirty if record == 0}
+        changed.update(
+            (record, (self.bucket_totals[record - 1], self.bucket_counts[record - 1]))
+            for record in self._dirty if record
+        )
+        if self._dirty_categories:
+            for position, (name, entry) in enumerate(self.categories.items()):
+                if name in self._dirty_categories:
+                    changed[1 + slots + position] = entry
+        pieces, end = [], 0
+        for record in sorted(changed):
+            start = record_offset(record)
+            pieces += [self._source[end:start], base64.b64encode(RECORD.pack(*changed[record])).decode('ascii')]
+            end = start + RECORD_CHARS
+        pieces.append(self._source[end:])
+        return ''.join(pieces)
+
+    @classmethod
+    def decode(cls, text, report_type):
+        if text.startswith(V2_PREFIX):
+            return cls._decode_v2(text)
+        if not text.startswith(PREFIX):
+            return cls.from_dict(json.loads(text), report_type)
+
+        blob = base64.b64decode(text[len(PREFIX):])
+        version, type_code, start, end, slots, categories = HEADER.unpack_from(blob)
+        if version != VERSION:
+            raise ValueError(f"Unsupported analytics payload version {version}.")
+        report = cls(REPORT_TYPES[type_code], datetime.date.fromordinal(start), datetime.date.fromordinal(end))
+        records = list(RECORD.iter_unpack(blob[HEADER.size:HEADER.size + RECORD.size * (1 + slots + categories)]))
+        report.total, report.count = records[0]
+        report.bucket_totals = array.array('q', (cents for cents, _ in records[1:1 + slots]))
+        report.bucket_counts = array.array('i', (count for _, count in records[1:1 + slots]))
+        offset = HEADER.size + RECORD.size * len(records)
+        names = blob[offset:].decode('utf-8').split(NAME_SEPARATOR) if categories else []
+        report.categories = {name: list(record) for name, record in zip(names, records[1 + slots:])}
+        report._source = text
+        return report
+
+    @classmethod
+    def _decode_v2(cls, text):
+        blob = zlib.decompress(base64.b64decode(text[len(V2_PREFIX):]))
+        _, type_code, start, end, total, count, slots, categories = V2_HEADER.unpack_from(blob)
+        report = cls(REPORT_TYPES[type_code], datetime.date.fromordinal(start), datetime.date.fromordinal(end))
+        report.total, report.count = total, count
+
+        offset = V2_HEADER.size
+        report.bucket_totals = _le_array('q', blob[offset:offset + 8 * slots])
+        offset += 8 * slots
+        report.bucket_counts = _le_array('i', blob[offset:offset + 4 * slots])
+        offset += 4 * slots
+        category_totals = _le_array('q', blob[offset:offset + 8 * categories])
+        offset += 8 * categories
+        category_counts = _le_array('i', blob[offset:offset + 4 * categories])
+        offset += 4 * categories
+        names = blob[offset:].decode('utf-8').split(NAME_SEPARATOR) if categories else []
+        report.categories = {
+            name: [cents, count] for name, cents, count in zip(names, category_totals, category_counts)
+        }
+        return report
+
+
+# Both sizes are multiples of 3 bytes, so every record is exactly 16 base64 characters.
+RECORD_CHARS = RECORD.size * 4 // 3
+
+
+def record_offset(record):
+    return len(PREFIX) + (HEADER.size + RECORD.size * record) * 4 // 3
@@ -0,0 +1,142 @@
+import calendar
+import datetime
+import multiprocessing
+
+from django.db import connections, transaction
+from django.db.models import Case, DateField, F, Q, Value, When
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from . import rollups
+from .caching import invalidate_user
+from .currency import fill_base_amounts
+from .models import Expense, RecurringExpense
+
+BATCH_SIZE = 1000
+Frequency = RecurringExpense.Frequency
+
+
+def add_months(day, months, anchor_day):
+    index = day.month - 1 + months
+    year, month = day.year + index // 12, index % 12 + 1
+    return datetime.date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence(start, frequency, n):
+    if frequency == Frequency.DAILY:
+        return start + datetime.timedelta(days=n)
+    if frequency == Frequency.WEEKLY:
+        return start + datetime.timedelta(weeks=n)
+    if frequency == Frequency.MONTHLY:
+        return add_months(start, n, start.day)
+    return add_months(start, 12 * n, start.day)
+
+
+def first_index_after(start, frequency, day):
+    if day < start:
+        return 0
+    if frequency == Frequency.DAILY:
+        return (day - start).days + 1
+    if frequency == Frequency.WEEKLY:
+        return (day - start).days // 7 + 1
+
+    months = (day.year - start.year) * 12 + day.month - start.month
+    n = months if frequency == Frequency.MONTHLY else months // 12
+    # Month-end clamping can put the estimate one step off either way.
+    while occurrence(start, frequency, n) <= day:
+        n += 1
+    while n > 0 and occurrence(start, frequency, n - 1) > day:
+        n -= 1
+    return n
+
+
+def due_dates(start, frequency, end_date, materialized_through, until):
+    stop = min(end_date, until) if end_date else until
+    n = first_index_after(start, frequency, materialized_through) if materialized_through else 0
+    while True:
+        day = occurrence(start, frequency, n)
+        if day > stop:
+            return
+        yield day
+        n += 1
+
+
+def due_recurrences(until, shard=0, shards=1):
+    queryset = RecurringExpense.objects.filter(
+        Q(materialized_through__isnull=True) | Q(materialized_through__lt=until),
+        Q(end_date__isnull=True) | Q(materialized_through__isnull=True) | Q(end_date__gt=F('materialized_through')),
+        start_date__lte=until,
+    )
+    if shards > 1:
+        queryset = queryset.alias(shard=Mod('user_id', shards)).filter(shard=shard)
+    return queryset
+
+
+def materialize_batch(rows, until):
+    expenses, marks, deltas = [], {}, {}
+    for row in rows:
+        dates = list(due_dates(
+            row['start_date'], row['frequency'], row['end_date'], row['materialized_through'], until,
+        ))
+        if not dates:
+            continue
+        for day in dates:
+            expenses.append(Expense(
+                user_id=row['user_id'],
+                recurring_id=row['id'],
+                category=row['category'],
+                amount=row['amount'],
+                currency=row['currency'],
+                description=row['description'],
+                date=day,
+            ))
+        marks[row['id']] = dates[-1]
+
+    if marks:
+        fill_base_amounts(expenses)
+        for expense in expenses:
+            deltas.setdefault(expense.user_id, []).append((expense.date, expense.category, expense.base_amount, 1))
+        Expense.objects.bulk_create(expenses, batch_size=BATCH_SIZE)
+        RecurringExpense.objects.filter(pk__in=marks).update(materialized_through=Case(
+            *[When(pk=pk, then=Value(day)) for pk, day in marks.items()],
+            output_field=DateField(),
+        ))
+        # bulk_create skips the post_save signal, so fold the new rows into the rollups here.
+        for user_id, user_deltas in deltas.items():
+            rollups.apply_deltas(user_id, user_deltas)
+            invalidate_user(user_id)
+    return len(expenses)
+
+
+def materialize(until=None, batch_size=BATCH_SIZE, shard=0, shards=1):
+    until = until or timezone.localdate()
+    stats = {'recurrences': 0, 'created': 0}
+    fields = ('id', 'user_id', 'category', 'amount', 'currency', 'description', 'frequency',
+              'start_date', 'end_date', 'materialized_through')
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                due_recurrences(until, shard, shards)
+                .select_for_update(skip_locked=True)
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values(*fields)[:batch_size]
+            )
+            if not rows:
+                break
+            stats['recurrences'] += len(rows)
+            stats['created'] += materialize_batch(rows, until)
+        last_pk = rows[-1]['id']
+    return stats
+
+
+def materialize_all(until=None, batch_size=BATCH_SIZE, workers=1):
+    if workers <= 1:
+        return materialize(until, batch_size)
+
+    # Children must open their own connections rather than share the parent's socket.
+    connections.close_all()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        results = pool.starmap(materialize, [(until, batch_size, shard, workers) for shard in range(workers)])
+    return {key: sum(result[key] for result in results) for key in ('recurrences', 'created')}
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+
+from .models import Expense
+
+CENT = Decimal('0.01')
+
+
+def summary_rows(user_id, start, end):
+    return (
+        Expense.objects.filter(user_id=user_id, date__range=(start, end))
+        .values('category')
+        .annotate(
+            total=Sum('base_amount'),
+            count=Count('id'),
+            recurring=Sum('base_amount', filter=Q(recurring__isnull=False), default=Decimal('0')),
+        )
+        .order_by('-total')
+    )
+
+
+def build_summary(start, end, categories):
+    total = sum((row['total'] for row in categories), Decimal('0'))
+    recurring = sum((row['recurring'] for row in categories), Decimal('0'))
+    for row in categories:
+        row['share'] = round(float(row['total'] / total * 100), 1) if total else 0.0
+        row['total'] = row['total'].quantize(CENT)
+        del row['recurring']
+    return {
+        'start': start,
+        'end': end,
+        'currency': settings.BASE_CURRENCY,
+        'total': total.quantize(CENT),
+        'count': sum(row['count'] for row in categories),
+        'recurring': recurring.quantize(CENT),
+        'one_time': (total - recurring).quantize(CENT),
+        'categories': categories,
+    }
+
+
+def summarize(user_id, start, end):
+    return build_summary(start, end, list(summary_rows(user_id, start, end)))
+
+
+async def asummarize(user_id, start, end):
+    return build_summary(start, end, [row async for row in summary_rows(user_id, start, end)])
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import AnalyticsCache, Expense, MonthlyStatement
+from .payloads import RollupReport, period_bounds
+
+ReportType = AnalyticsCache.ReportType
+
+
+def is_current(cache, report_type, today):
+    start, _ = period_bounds(report_type, today)
+    return cache.report is not None and cache.report.period_start == start
+
+
+def build_report(user_id, report_type, today):
+    start, end = period_bounds(report_type, today)
+    report = RollupReport(report_type, start, end)
+    rows = (
+        Expense.objects.filter(user_id=user_id, date__range=(start, end))
+        .values_list('category', 'date')
+        .annotate(total=Sum('base_amount'), count=Count('id'))
+        .order_by()
+    )
+    for category, day, total, count in rows:
+        report.add(day, category, total, count)
+    return report
+
+
+def rebuild_report(user_id, report_type, today=None, cache=None):
+    today = today or timezone.localdate()
+    if cache is None:
+        cache, _ = AnalyticsCache.objects.get_or_create(user_id=user_id, report_type=report_type)
+    cache.report = build_report(user_id, report_type, today)
+    cache.save()
+    return cache
+
+
+def rebuild_user(user_id, today=None):
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        caches = {
+            cache.report_type: cache
+            for cache in AnalyticsCache.objects.select_for_update().filter(user_id=user_id)
+        }
+        for report_type in ReportType.values:
+            rebuild_report(user_id, report_type, today, caches.get(report_type))
+
+
+def apply_deltas(user_id, deltas, today=None):
+    """Fold ``(date, category, amount, count)`` deltas into the user's cached reports.
+
+    Reports that are missing or belong to an earlier period are rebuilt from
+    the expense table instead, which already reflects the deltas. Statements
+    of closed months the deltas fall in are marked stale.
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    with transaction.atomic(savepoint=False):
+        MonthlyStatement.reopen(user_id, [day for day, _, _, _ in deltas], today)
+        caches = {
+            cache.report_type: cache
+            for cache in AnalyticsCache.objects.select_for_update().filter(user_id=user_id)
+        }
+        current = []
+        for report_type in ReportType.values:
+            cache = caches.get(report_type)
+            if cache is None or not is_current(cache, report_type, today):
+                rebuild_report(user_id, report_type, today, cache)
+                continue
+
+            report = cache.report
+            for day, category, amount, count in deltas:
+                if report.covers(day):
+                    report.add(day, category, amount, count)
+            # Written even when no delta fell in this period: last_updated doubles
+            # as the user's analytics version for conditional GETs.
+            cache._data = report.encode()
+            cache.last_updated = now
+            current.append(cache)
+        if current:
+            AnalyticsCache.objects.bulk_update(current, ['_data', 'last_updated'])
+
+
+def touch(*user_ids):
+    AnalyticsCache.objects.filter(user_id__in=user_ids).update(last_updated=timezone.now())
+
+
+def last_updated(user_id):
+    return AnalyticsCache.objects.filter(user_id=user_id).aggregate(last=Max('last_updated'))['last']
+
+
+async def alast_updated(user_id):
+    return (await AnalyticsCache.objects.filter(user_id=user_id).aaggregate(last=Max('last_updated')))['last']
+
+
+def get_report(user_id, report_type, today=None):
+    today = today or timezone.localdate()
+    cache = AnalyticsCache.objects.filter(user_id=user_id, report_type=report_type).first()
+    if cache is None or not is_current(cache, report_type, today):
+        with transaction.atomic():
+            cache = rebuild_report(user_id, report_type, today, cache)
+    return cache.data
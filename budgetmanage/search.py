@@ -0,0 +1,176 @@
+import json
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Expense
+
+FIELDS = ('id', 'date', 'category', 'amount', 'currency', 'description')
+ADMIN_MATCHES = 10_000
+MAX_TERMS = 8
+# Shorter prefixes would match most of the index.
+MIN_PREFIX = 2
+TERM = re.compile(r'[^\W_]+')
+
+FTS_TABLE = 'budgetmanage_expense_fts'
+# Contentless: the expense table stays the source of truth, and the owner
+# column ("u<user_id>") keeps a MATCH within one user's rows.
+SQLITE_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        owner, category, description,
+        content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+"""
+_ROW = "{0}.id, 'u' || {0}.user_id, {0}.category, {0}.description"
+_INSERT = f"INSERT INTO {FTS_TABLE} (rowid, owner, category, description) VALUES ({_ROW.format('new')});"
+_DELETE = (
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, owner, category, description) "
+    f"VALUES ('delete', {_ROW.format('old')});"
+)
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_insert': f"AFTER INSERT ON budgetmanage_expense BEGIN {_INSERT} END",
+    f'{FTS_TABLE}_delete': f"AFTER DELETE ON budgetmanage_expense BEGIN {_DELETE} END",
+    f'{FTS_TABLE}_update': (
+        f"AFTER UPDATE OF user_id, category, description ON budgetmanage_expense BEGIN {_DELETE} {_INSERT} END"
+    ),
+}
+
+# 'simple' skips stemming: descriptions mix languages and prefix matching
+# already covers plurals. btree_gin lets one GIN index cover user_id too.
+POSTGRES_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    """
+    ALTER TABLE budgetmanage_expense ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(category, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX expense_search_idx ON budgetmanage_expense USING gin (user_id, search_vector)",
+]
+
+
+def _sqlite_objects(cursor, kind):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = %s AND name LIKE %s", [kind, f'{FTS_TABLE}%'])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def install_sqlite(conn):
+    """Create the FTS5 table and its triggers, reindexing if any trigger was missing.
+
+    Safe to repeat. SQLite drops triggers whenever a migration remakes the
+    expense table, so this also runs after every migrate.
+    """
+    with conn.cursor() as cursor:
+        triggers = _sqlite_objects(cursor, 'trigger')
+        if triggers == set(SQLITE_TRIGGERS):
+            return False
+        cursor.execute(SQLITE_TABLE)
+        for name, body in SQLITE_TRIGGERS.items():
+            if name not in triggers:
+                cursor.execute(f"CREATE TRIGGER {name} {body}")
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, owner, category, description) "
+            f"SELECT {_ROW.format('budgetmanage_expense')} FROM budgetmanage_expense"
+        )
+    return True
+
+
+def has_index(conn=connection):
+    if conn.vendor == 'postgresql':
+        return True
+    if conn.vendor != 'sqlite':
+        return False
+    # Absent when this SQLite build lacks FTS5; searches then fall back to LIKE.
+    if not hasattr(conn, '_expense_fts'):
+        with conn.cursor() as cursor:
+            conn._expense_fts = FTS_TABLE in _sqlite_objects(cursor, 'table')
+    return conn._expense_fts
+
+
+def terms(text):
+    words = TERM.findall(text.lower())
+    return [word for word in words if len(word) >= MIN_PREFIX][:MAX_TERMS] or words[:1]
+
+
+def _fts_match(words, user_id=None):
+    match = '{category description} : (' + ' AND '.join(f'"{word}"*' for word in words) + ')'
+    return f'owner : "u{user_id}" AND {match}' if user_id is not None else match
+
+
+def _tsquery(words):
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def _tsvector_matches(words):
+    return RawSQL("search_vector @@ to_tsquery('simple', %s)", [_tsquery(words)], output_field=BooleanField())
+
+
+def _like(queryset, words):
+    for word in words:
+        queryset = queryset.filter(Q(description__icontains=word) | Q(category__icontains=word))
+    return queryset
+
+
+def _id_list(ids):
+    # One parameter instead of thousands of placeholders in every query over the result.
+    if connection.vendor == 'postgresql':
+        return RawSQL("SELECT unnest(%s::bigint[])", [ids])
+    if connection.vendor == 'sqlite':
+        return RawSQL("SELECT value FROM json_each(%s)", [json.dumps(ids)])
+    return ids
+
+
+def filter_matches(queryset, text, limit=None):
+    """Narrow an expense queryset to rows whose description or category match every word of ``text``.
+
+    With ``limit``, only the newest ``limit`` matches (by id) are kept, so a
+    common word costs the same as a rare one. Their ids are looked up once,
+    so counting and paging the result doesn't repeat the match.
+    """
+    words = terms(text)
+    if not words:
+        return queryset.none()
+    if connection.vendor == 'sqlite' and has_index():
+        sql, params = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [_fts_match(words)]
+        if not limit:
+            return queryset.filter(pk__in=RawSQL(sql, params))
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} ORDER BY rowid DESC LIMIT %s", [*params, limit])
+            ids = [row[0] for row in cursor.fetchall()]
+    else:
+        matches = queryset.filter(_tsvector_matches(words)) if has_index() else _like(queryset, words)
+        if not limit:
+            return matches
+        ids = list(matches.order_by('-pk').values_list('pk', flat=True)[:limit])
+    return queryset.filter(pk__in=_id_list(ids))
+
+
+def ranked(user_id, text, limit=20):
+    """Best matches of ``text`` among the user's expenses; every word may be a prefix."""
+    words = terms(text)
+    if not words:
+        return []
+    expenses = Expense.objects.filter(user_id=user_id)
+    if not has_index():
+        return list(_like(expenses, words).order_by('-date', '-id').values(*FIELDS)[:limit])
+
+    if connection.vendor == 'postgresql':
+        rank = RawSQL("ts_rank(search_vector, to_tsquery('simple', %s))", [_tsquery(words)], output_field=FloatField())
+        return list(
+            expenses.filter(_tsvector_matches(words))
+            .annotate(rank=rank).order_by('-rank', '-date', '-id').values(*FIELDS)[:limit]
+        )
+
+    with connection.cursor() as cursor:
+        # Category hits weigh double; the owner column only scopes the match.
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, 0.0, 2.0, 1.0) LIMIT %s",
+            [_fts_match(words, user_id), limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    rows = {row['id']: row for row in expenses.filter(pk__in=ids).values(*FIELDS)}
+    return [rows[pk] for pk in ids if pk in rows]
@@ -13,6 +13,9 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import tempfile
+
+from budgetmanage.databases import database_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -28,7 +31,7 @@ if env_path.exists():
 SECRET_KEY = os.environ.get("DJANGO_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', 'True').lower() in ('1', 'true', 'yes')
 
 ALLOWED_HOSTS = ['.onrender.com', '127.0.0.1']
 
@@ -48,8 +51,18 @@ INSTALLED_APPS = [
 
 AUTH_USER_MODEL = 'accounts.User'
 
+# The cached backend resolves request.user (with its profile) from the cache;
+# ModelBackend stays listed so sessions created before it keep working.
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,24 +85,69 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'budgetmanage.context_processors.user_cache',
             ],
         },
     },
 ]
 
+# Production profile: keep compiled templates for the life of the process.
+# (Under DEBUG the default loaders still cache, but re-check files for changes.)
+if not DEBUG:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'budgetmanage.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DATABASE_URL selects PostgreSQL (persistent connections, optional pooling via
+# DB_POOL) or another SQLite file; without it the local db.sqlite3 is used.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+    'default': database_config(os.environ, BASE_DIR / 'db.sqlite3'),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# 'default' is shared by every worker process (Redis when REDIS_URL is set,
+# otherwise the filesystem); 'tiered' puts a small per-process LRU in front of
+# it for entries whose keys carry the user's generation.
+if os.environ.get('REDIS_URL'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'budgetmanage-cache')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
     }
+
+CACHES = {
+    'default': SHARED_CACHE,
+    'tiered': {
+        'BACKEND': 'budgetmanage.caching.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': 2000,
+            'LOCAL_TIMEOUT': 60,
+        },
+    },
 }
 
+# Runs the tests against in-memory caches.
+TEST_RUNNER = 'budgetmanage.testing.TestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -121,6 +179,20 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Expenses keep the currency they were paid in plus the amount in BASE_CURRENCY,
+# which every total is summed in. Rates come from `manage.py load_exchange_rates`;
+# changing the base once expenses exist needs every base amount recomputed.
+# UPI payments are always in rupees, so INR works without any rates loaded.
+# Expenses logged before currencies existed are labelled with their owner's
+# preferred currency (USD unless changed); on an INR base, load rates for those
+# currencies so their base amounts are re-priced.
+BASE_CURRENCY = os.environ.get('BASE_CURRENCY', 'INR')
+
+# Copy each activity into every follower's timeline when it is written, so a
+# feed page is one index range scan however many friends a user has. Enable
+# it before users have friends, or run `manage.py rebuild_timelines` after.
+ACTIVITY_FANOUT = os.environ.get('ACTIVITY_FANOUT', 'False').lower() in ('1', 'true', 'yes')
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
@@ -131,6 +203,23 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Outside DEBUG, pages load one bundle per asset type (built by build_assets)
+# and collectstatic gives every file a content-hashed name plus .gz/.br copies,
+# which WhiteNoise serves with immutable, far-future cache headers.
+ASSET_BUNDLES = not DEBUG
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -0,0 +1,109 @@
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from accounts.signals import users_changed
+from . import currency, leaderboards, rollups, search
+from .caching import invalidate_user, invalidate_users
+from .databases import SQLITE_TIMEOUT
+from .models import Expense, RecurringExpense, Tombstone
+
+
+def _origin_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def _apply(changes):
+    per_user = {}
+    for user_id, date, category, amount, count in changes:
+        per_user.setdefault(user_id, []).append((date, category, amount, count))
+    for user_id, deltas in per_user.items():
+        rollups.apply_deltas(user_id, deltas)
+        invalidate_user(user_id)
+
+
+@receiver(pre_save, sender=Expense)
+def expense_saving(sender, instance, raw=False, **kwargs):
+    if not raw:
+        currency.fill_base_amounts([instance])
+
+
+@receiver(post_save, sender=Expense)
+def expense_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    changes = []
+    old = getattr(instance, '_rollup_state', None)
+    if old is not None and not created:
+        user_id, date, category, amount = old
+        changes.append((user_id, date, category, -amount, -1))
+    new = instance.rollup_state()
+    user_id, date, category, amount = new
+    changes.append((user_id, date, category, amount, 1))
+    instance._rollup_state = new
+    _apply(changes)
+
+
+@receiver(post_delete, sender=Expense)
+def expense_deleted(sender, instance, origin=None, **kwargs):
+    # Cascades from deleting the user take the cached reports down with them.
+    if _origin_model(origin) is not Expense:
+        return
+    user_id, date, category, amount = getattr(instance, '_rollup_state', None) or instance.rollup_state()
+    _apply([(user_id, date, category, -amount, -1)])
+    Tombstone.objects.create(user_id=user_id, kind=Tombstone.Kind.EXPENSE, object_id=instance.pk)
+
+
+@receiver(pre_delete, sender=RecurringExpense)
+def recurring_deleting(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is not RecurringExpense:
+        return
+    # The SET_NULL that detaches the occurrences is a bulk UPDATE that leaves
+    # updated_at alone; bump it here so sync clients pull the new recurring_id.
+    Expense.objects.filter(recurring=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=RecurringExpense)
+def recurring_deleted(sender, instance, origin=None, **kwargs):
+    # Its occurrences are detached with a bulk UPDATE that sends no Expense signals,
+    # but the recurring/one-time split still changed.
+    rollups.touch(instance.user_id)
+    invalidate_user(instance.user_id)
+    if _origin_model(origin) is RecurringExpense:
+        Tombstone.objects.create(user_id=instance.user_id, kind=Tombstone.Kind.RECURRING, object_id=instance.pk)
+
+
+@receiver(users_changed)
+def user_changed(sender, user_ids, **kwargs):
+    invalidate_users(user_ids)
+
+
+@receiver(post_delete, sender=UserProfile)
+def profile_deleted(sender, instance, **kwargs):
+    leaderboards.moved((board, getattr(instance, field), -1) for board, field in leaderboards.BOARDS.items())
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # WAL lets readers run alongside the single writer; NORMAL only syncs at
+    # checkpoints, which WAL keeps crash-safe (a power cut may drop the last commits).
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_TIMEOUT * 1000}')
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, using, **kwargs):
+    # Migrations that remake the expense table on SQLite drop its FTS triggers.
+    if sender.name != 'budgetmanage':
+        return
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and search.has_index(connection):
+        search.install_sqlite(connection)
@@ -0,0 +1,186 @@
+import itertools
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from accounts.models import UserActivity, UserProfile
+from . import achievements, feed, leaderboards, rollups
+from .caching import invalidate_user
+from .models import AnalyticsCache, Expense, MonthlyStatement
+from .payloads import RollupReport, from_cents, period_bounds, to_cents
+from .recurrences import add_months
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 5000
+MONTHLY = AnalyticsCache.ReportType.MONTHLY
+
+
+def goal_outcome(report, goal):
+    # The savings goal is met by keeping the month's spending within it; a month
+    # with nothing logged says nothing either way.
+    if not goal:
+        return None, None
+    if not report.count:
+        return goal, None
+    return goal, report.total <= to_cents(goal)
+
+
+def _count_goals(user_ids, step):
+    profiles = UserProfile.objects.filter(user_id__in=user_ids)
+    leaderboards.moved(
+        move for goals_met in profiles.select_for_update().values_list('goals_met', flat=True)
+        for move in leaderboards.moves('goals', goals_met, goals_met + step)
+    )
+    profiles.update(goals_met=F('goals_met') + step)
+
+
+def _write(statements, awards, revoked, reclosed):
+    user_ids = [statement.user_id for statement in statements]
+    with transaction.atomic():
+        if reclosed:
+            MonthlyStatement.objects.filter(month=statements[0].month, user_id__in=reclosed).delete()
+        MonthlyStatement.objects.bulk_create(statements, ignore_conflicts=True)
+        achievements.catalog()
+        Through = UserProfile.achievements.through
+        Through.objects.bulk_create(
+            [Through(userprofile_id=profile_id, achievement_id=achievements.Keys.GOAL_ACHIEVER) for profile_id, _ in awards],
+            ignore_conflicts=True,
+        )
+        if revoked:
+            _count_goals(revoked, -1)
+        if awards:
+            _count_goals([user_id for _, user_id in awards], 1)
+            month = f"{statements[0].month:%B %Y}"
+            feed.record([
+                UserActivity(
+                    user_id=user_id, kind=UserActivity.Kind.ACHIEVEMENT,
+                    activity_description=f"Met their savings goal for {month}",
+                )
+                for _, user_id in awards
+            ])
+        # Moves the analytics version so cached history picks up the closed month.
+        rollups.touch(*user_ids)
+        for user_id in user_ids:
+            invalidate_user(user_id)
+
+
+def close_month(month, batch_size=BATCH_SIZE):
+    """Write the statement of every user who spent or had a savings goal in ``month``.
+
+    All users' totals come from one grouped query, streamed in user order.
+    Users whose month is already closed are skipped, so a re-run only fills gaps
+    and redoes stale statements, moving goals_met if the outcome changed.
+    """
+    start, end = period_bounds(MONTHLY, month)
+    closed, stale = set(), {}
+    for user_id, is_stale, goal_met in MonthlyStatement.objects.filter(month=start).values_list(
+        'user_id', 'stale', 'goal_met',
+    ):
+        if is_stale:
+            stale[user_id] = goal_met
+        else:
+            closed.add(user_id)
+    goals = {
+        user_id: (profile_id, goal)
+        for user_id, profile_id, goal in UserProfile.objects.filter(monthly_savings_goal__gt=0)
+        .values_list('user_id', 'pk', 'monthly_savings_goal')
+    }
+    rows = (
+        Expense.objects.filter(date__range=(start, end))
+        .values_list('user_id', 'date', 'category')
+        .annotate(total=Sum('base_amount'), count=Count('id'))
+        .order_by('user_id')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    reports = (
+        (user_id, list(user_rows)) for user_id, user_rows in itertools.groupby(rows, key=lambda row: row[0])
+    )
+    spent = set()
+    idle = ((user_id, []) for user_id in goals.keys() | stale.keys() if user_id not in spent)
+    stats = {'statements': 0, 'goals_met': 0}
+    statements, awards, revoked, reclosed = [], [], [], []
+    for user_id, user_rows in itertools.chain(reports, idle):
+        spent.add(user_id)
+        if user_id in closed:
+            continue
+        report = RollupReport(MONTHLY, start, end)
+        for _, day, category, total, count in user_rows:
+            report.add(day, category, total, count)
+        profile_id, goal = goals.get(user_id, (None, None))
+        goal, goal_met = goal_outcome(report, goal)
+        statements.append(MonthlyStatement(
+            user_id=user_id, month=start, currency=settings.BASE_CURRENCY,
+            total=from_cents(report.total), count=report.count, data=report.encode(),
+            goal=goal, goal_met=goal_met,
+        ))
+        was_met = stale.get(user_id)
+        if user_id in stale:
+            reclosed.append(user_id)
+        if goal_met and not was_met:
+            awards.append((profile_id, user_id))
+        elif was_met and not goal_met:
+            revoked.append(user_id)
+        if len(statements) >= batch_size:
+            _write(statements, awards, revoked, reclosed)
+            stats['statements'] += len(statements)
+            stats['goals_met'] += len(awards)
+            statements, awards, revoked, reclosed = [], [], [], []
+    if statements:
+        _write(statements, awards, revoked, reclosed)
+        stats['statements'] += len(statements)
+        stats['goals_met'] += len(awards)
+    return stats
+
+
+def _month(start, report, closed, currency, goal, goal_met):
+    data = report.as_dict()
+    return {
+        'month': start.strftime('%Y-%m'),
+        'closed': closed,
+        'currency': currency,
+        'total': data['total'],
+        'count': data['count'],
+        'categories': data['categories'],
+        'goal': str(goal) if goal else None,
+        'goal_met': goal_met,
+    }
+
+
+def history(user_id, months, today):
+    """The last ``months`` months, oldest first.
+
+    Closed months are read from their statements; only months without a fresh
+    one (normally just the current month) are aggregated from the expense table.
+    """
+    current = today.replace(day=1)
+    starts = [add_months(current, -n, 1) for n in range(months - 1, -1, -1)]
+    statements = {
+        statement.month: statement
+        for statement in MonthlyStatement.objects.filter(user_id=user_id, month__gte=starts[0], stale=False)
+    }
+    open_months = [start for start in starts if start not in statements]
+    live = {start: RollupReport(MONTHLY, *period_bounds(MONTHLY, start)) for start in open_months}
+    if open_months:
+        rows = (
+            Expense.objects.filter(user_id=user_id, date__gte=open_months[0], date__lte=today)
+            .values_list('date', 'category')
+            .annotate(total=Sum('base_amount'), count=Count('id'))
+            .order_by()
+        )
+        for day, category, total, count in rows:
+            report = live.get(day.replace(day=1))
+            if report is not None:
+                report.add(day, category, total, count)
+    goal = UserProfile.objects.filter(user_id=user_id).values_list('monthly_savings_goal', flat=True).first()
+
+    result = []
+    for start in starts:
+        statement = statements.get(start)
+        if statement is not None:
+            result.append(_month(
+                start, statement.report, True, statement.currency, statement.goal, statement.goal_met,
+            ))
+        else:
+            result.append(_month(start, live[start], False, settings.BASE_CURRENCY, goal, None))
+    return result
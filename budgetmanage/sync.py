@@ -0,0 +1,211 @@
+import datetime
+import hashlib
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import achievements
+from .forms import AddExpenseForm, RecurringExpenseForm
+from .models import Expense, RecurringExpense, Tombstone
+from .payloads import from_version, version
+
+PAGE_SIZE = 200
+MAX_CHANGES = 200
+# Rows are stamped when saved but only become visible when their transaction
+# commits. Pages stop this far behind the clock, so a slow commit can't land
+# behind a cursor that has already moved past it.
+SETTLE = datetime.timedelta(seconds=5)
+TOMBSTONE_RETENTION = datetime.timedelta(days=90)
+
+EXPENSE_FIELDS = ('id', 'date', 'category', 'amount', 'currency', 'description', 'recurring_id')
+RECURRING_FIELDS = ('id', 'date', 'category', 'amount', 'currency', 'description', 'frequency', 'start_date', 'end_date')
+
+# Merged into one change stream ordered by (stamp, rank, pk); a cursor is a position in it.
+STREAMS = (
+    ('expenses', Expense, 'updated_at', EXPENSE_FIELDS),
+    ('recurring', RecurringExpense, 'updated_at', RECURRING_FIELDS),
+    ('deleted', Tombstone, 'deleted_at', ('id', 'kind', 'object_id')),
+)
+KINDS = {
+    Tombstone.Kind.EXPENSE: (Expense, AddExpenseForm, EXPENSE_FIELDS),
+    Tombstone.Kind.RECURRING: (RecurringExpense, RecurringExpenseForm, RECURRING_FIELDS),
+}
+
+
+class SyncError(ValueError):
+    pass
+
+
+class CursorExpired(SyncError):
+    pass
+
+
+def encode_cursor(stamp, rank, pk):
+    return f"{stamp}-{rank}-{pk}"
+
+
+def decode_cursor(cursor):
+    try:
+        stamp, rank, pk = (int(part) for part in cursor.split('-'))
+        from_version(stamp)
+    except (ValueError, OverflowError):
+        raise SyncError("Invalid cursor.")
+    if not 0 <= rank <= len(STREAMS):
+        raise SyncError("Invalid cursor.")
+    return stamp, rank, pk
+
+
+def _after(field, rank, position):
+    stamp, cursor_rank, pk = position
+    moment = from_version(stamp)
+    if rank > cursor_rank:
+        return Q(**{f'{field}__gte': moment})
+    if rank < cursor_rank:
+        return Q(**{f'{field}__gt': moment})
+    # The outer >= bound keeps the condition a range the (user, stamp) index can seek to.
+    return Q(**{f'{field}__gte': moment}) & (Q(**{f'{field}__gt': moment}) | Q(pk__gt=pk))
+
+
+def changes_since(user, cursor=None, limit=PAGE_SIZE, now=None):
+    """Return one page of the user's rows changed after ``cursor``, oldest first.
+
+    Without a cursor every live row is returned and deletions are skipped.
+    Keep requesting with the returned cursor while ``has_more`` is set; the
+    last page's cursor is the one to store for the next sync.
+    """
+    now = now or timezone.now()
+    horizon = now - SETTLE
+    position = decode_cursor(cursor) if cursor else None
+    if position and from_version(position[0]) < now - TOMBSTONE_RETENTION:
+        raise CursorExpired("This cursor is older than the kept deletion history; sync again without one.")
+
+    items = []
+    for rank, (name, model, field, fields) in enumerate(STREAMS):
+        if position is None and model is Tombstone:
+            continue
+        queryset = model.objects.filter(user=user, **{f'{field}__lte': horizon})
+        if position:
+            queryset = queryset.filter(_after(field, rank, position))
+        for row in queryset.order_by(field, 'pk').values(field, *fields)[:limit + 1]:
+            row['version'] = version(row.pop(field))
+            items.append((row['version'], rank, row['id'], row))
+    items.sort(key=lambda item: item[:3])
+
+    page = items[:limit]
+    data = {'expenses': [], 'recurring': [], 'deleted': [], 'has_more': len(items) > limit}
+    for stamp, rank, pk, row in page:
+        if STREAMS[rank][1] is Tombstone:
+            data['deleted'].append({'type': row['kind'], 'id': row['object_id'], 'version': stamp})
+        else:
+            data[STREAMS[rank][0]].append(row)
+    if data['has_more']:
+        data['cursor'] = encode_cursor(*page[-1][:3])
+    else:
+        data['cursor'] = encode_cursor(version(horizon), len(STREAMS), 0)
+    return data
+
+
+def serialize(instance, fields):
+    row = {field: getattr(instance, field) for field in fields}
+    row['version'] = version(instance.updated_at)
+    return row
+
+
+def client_hash(client_id):
+    return hashlib.sha256(f"sync|{client_id}".encode('utf-8')).hexdigest()
+
+
+def _form_data(instance, form_class, fields):
+    data = {'category_name': instance.category} if instance else {}
+    if instance:
+        data.update({name: getattr(instance, name) for name in form_class._meta.fields})
+    for name, value in fields.items():
+        data['category_name' if name == 'category' else name] = value
+    return data
+
+
+def _check(change):
+    if not isinstance(change, dict) or change.get('type') not in KINDS:
+        raise SyncError("Each change needs a type of 'expense' or 'recurring'.")
+    if not isinstance(change.get('fields', {}), dict):
+        raise SyncError("fields must be an object.")
+    for key in ('id', 'version'):
+        if change.get(key) is not None and (not isinstance(change[key], int) or isinstance(change[key], bool)):
+            raise SyncError(f"{key} must be an integer.")
+    if change.get('id') is not None and change.get('version') is None:
+        raise SyncError("Updates and deletes need the version they were based on.")
+
+
+def apply_changes(user, changes):
+    """Apply a batch of client edits in one transaction and report each outcome.
+
+    Updates and deletes carry the ``version`` they were made against; if the
+    row has moved on since, nothing is written and the server's row comes
+    back as a ``conflict`` for the client to resolve. Expense creates that
+    carry a ``client_id`` are idempotent, so a retried batch adds nothing twice.
+    """
+    results, created, categories = [], 0, []
+    with transaction.atomic():
+        profile = achievements.locked_profile(user)
+        # Row locks keep the materializer from writing a recurrence we are about to save.
+        rows = {
+            kind: model.objects.select_for_update().filter(user=user).in_bulk([
+                change['id'] for change in changes
+                if isinstance(change, dict) and change.get('type') == kind and isinstance(change.get('id'), int)
+            ])
+            for kind, (model, form_class, fields) in KINDS.items()
+        }
+        client_ids = [
+            client_hash(change['client_id']) for change in changes
+            if isinstance(change, dict) and change.get('type') == Tombstone.Kind.EXPENSE and change.get('client_id')
+        ]
+        synced = {expense.import_hash: expense for expense in Expense.objects.filter(user=user, import_hash__in=client_ids)}
+
+        for index, change in enumerate(changes):
+            try:
+                _check(change)
+            except SyncError as exc:
+                results.append({'index': index, 'status': 'invalid', 'error': str(exc)})
+                continue
+            model, form_class, fields = KINDS[change['type']]
+            result = {'index': index}
+            results.append(result)
+
+            if change.get('id') is not None:
+                instance = rows[change['type']].get(change['id'])
+                if instance is None:
+                    result['status'] = 'deleted' if change.get('deleted') else 'conflict'
+                    result['server'] = None
+                    continue
+                if version(instance.updated_at) != change['version']:
+                    result.update(status='conflict', server=serialize(instance, fields))
+                    continue
+                if change.get('deleted'):
+                    instance.delete()
+                    del rows[change['type']][change['id']]
+                    result['status'] = 'deleted'
+                    continue
+            else:
+                instance = None
+                key = client_hash(change['client_id']) if change.get('client_id') else None
+                if key and change['type'] == Tombstone.Kind.EXPENSE and key in synced:
+                    result.update(status='applied', server=serialize(synced[key], fields))
+                    continue
+
+            form = form_class(_form_data(instance, form_class, change.get('fields', {})), instance=instance, user=user)
+            if not form.is_valid():
+                result.update(status='invalid', errors=form.errors)
+                continue
+            saved = form.save(commit=False)
+            if instance is None:
+                if change['type'] == Tombstone.Kind.EXPENSE and key:
+                    saved.import_hash = key
+                    synced[key] = saved
+                created += 1
+                categories.append(saved.category)
+            saved.save()
+            result.update(status='applied', server=serialize(saved, fields))
+
+        awarded = achievements.record_logs(profile, created, categories) if created else []
+    return {'results': results, 'achievements': awarded}
@@ -0,0 +1,22 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from budgetmanage.assets import asset_paths, is_module
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_css(page):
+    return format_html_join(
+        '\n', '<link rel="stylesheet" href="{}">', ((static(path),) for path in asset_paths(page, 'css'))
+    )
+
+
+@register.simple_tag
+def page_js(page):
+    script_type = format_html(' type="module"') if is_module(page) else ''
+    return format_html_join(
+        '\n', '<script{} src="{}"></script>', ((script_type, static(path)) for path in asset_paths(page, 'js'))
+    )
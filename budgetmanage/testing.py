@@ -0,0 +1,37 @@
+from django import test
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+
+# The on-disk default cache outlives test runs and is shared with the dev server.
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'tiered': {'BACKEND': 'budgetmanage.caching.TieredCache', 'LOCATION': 'default'},
+}
+
+
+class TestRunner(DiscoverRunner):
+    """The default runner, with every cache swapped for a private in-memory one."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches = test.override_settings(CACHES=TEST_CACHES)
+        self.caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+class FreshCache:
+    def setUp(self):
+        super().setUp()
+        # Test databases reuse user ids, so nothing an earlier test cached may answer for them.
+        caches['tiered'].clear()
+
+
+class TestCase(FreshCache, test.TestCase):
+    pass
+
+
+class TransactionTestCase(FreshCache, test.TransactionTestCase):
+    pass
@@ -0,0 +1,408 @@
+import datetime
+import io
+import threading
+import unittest
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.identity import get_user
+from accounts.models import Achievement, User, UserActivity, UserProfile
+from .currency import RATES
+from .imports import import_statement, open_text
+from .management.commands.check_admin_queries import ADMIN_BUDGET, admin_pages, seed
+from .management.commands.explain_queries import hot_queries
+from .models import Expense, MonthlyStatement
+from .payloads import RollupReport
+from .statements import close_month, history
+from .testing import TestCase, TransactionTestCase
+from .upi import ingest_scans
+
+
+class UpiScanTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        RATES.clear()
+        self.user = User.objects.create(username='scanner')
+
+    def test_default_install_ingests_rupee_scans(self):
+        # No exchange rates are loaded on a fresh install; UPI is always INR.
+        result = ingest_scans(self.user, [{'payload': 'upi://pay?pa=shop@okaxis&am=120.00'}])
+        self.assertEqual(result['created'], 1, result['errors'])
+        expense = Expense.objects.get(user=self.user)
+        self.assertEqual((expense.currency, str(expense.base_amount)), ('INR', '120.00'))
+
+    def test_static_qr_takes_the_entered_amount(self):
+        payload = 'upi://pay?pa=canteen@okaxis&pn=Canteen'
+        result = ingest_scans(self.user, [{'payload': payload}, {'payload': payload, 'amount': '45.50'}])
+        self.assertEqual(result['results'], ['invalid', 'created'])
+        self.assertEqual(result['errors'][0]['index'], 0)
+        self.assertEqual(str(Expense.objects.get(user=self.user).amount), '45.50')
+
+    def test_identical_purchases_are_kept_apart_by_scan_id(self):
+        payload = 'upi://pay?pa=shop@okaxis&am=20.00&tn=Tea'
+        scans = [
+            {'payload': payload, 'id': 'a', 'scanned_at': '2024-03-01T09:00:00Z'},
+            {'payload': payload, 'id': 'b', 'scanned_at': '2024-03-01T16:00:00Z'},
+        ]
+        today = datetime.date(2024, 3, 2)
+        self.assertEqual(ingest_scans(self.user, scans, today)['created'], 2)
+        # A re-sent copy of the same scan is still a duplicate.
+        self.assertEqual(ingest_scans(self.user, scans[:1], today)['results'], ['duplicate'])
+
+
+class CsvImportTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='importer')
+
+    def run_import(self, text):
+        return import_statement(self.user, open_text(io.BytesIO(text.encode('utf-8'))))
+
+    def imported(self):
+        return sorted(Expense.objects.filter(user=self.user).values_list('description', 'amount'))
+
+    def test_signed_amounts_import_only_money_out(self):
+        result = self.run_import(
+            "Date,Description,Amount\n2024-03-01,Salary,2500.00\n2024-03-02,Coffee,-4.50\n"
+        )
+        self.assertEqual((result['created'], result['skipped'], result['invalid']), (1, 1, 0))
+        self.assertEqual([row[0] for row in self.imported()], ['Coffee'])
+
+    def test_deposit_rows_are_skipped_not_invalid(self):
+        result = self.run_import(
+            "Date,Narration,Withdrawal Amount,Deposit Amount\n"
+            "01/03/2024,Rent,800.00,\n02/03/2024,Refund,,25.00\n"
+        )
+        self.assertEqual((result['created'], result['skipped'], result['invalid']), (1, 1, 0))
+        self.assertEqual([row[0] for row in self.imported()], ['Rent'])
+
+    def test_unsigned_list_imports_every_row(self):
+        result = self.run_import("Date,Category,Amount,Description\n2024-03-01,Food,12.00,Lunch\n2024-03-02,Bus,2.00,Fare\n")
+        self.assertEqual(result['created'], 2)
+
+
+class RollupPayloadTests(TestCase):
+    def test_patched_encoding_matches_a_full_encode(self):
+        report = RollupReport.empty('MONTHLY', datetime.date(2024, 2, 14))
+        report.add(datetime.date(2024, 2, 3), 'Food', Decimal('4.50'), 1)
+        report.add(datetime.date(2024, 2, 9), 'Bus', Decimal('2.00'), 1)
+        text = report.encode()
+
+        decoded = RollupReport.decode(text, 'MONTHLY')
+        decoded.add(datetime.date(2024, 2, 9), 'Food', Decimal('1.25'), 1)
+        decoded.add(datetime.date(2024, 2, 29), 'Bus', Decimal('3.00'), 1)
+        patched = decoded.encode()
+        self.assertEqual(len(patched), len(text))
+        self.assertEqual(patched, decoded._encode())
+        self.assertEqual(RollupReport.decode(patched, 'MONTHLY').as_dict(), decoded.as_dict())
+
+        # New or emptied categories move the layout, so those encode in full.
+        decoded.add(datetime.date(2024, 2, 10), 'Rent', Decimal('300.00'), 1)
+        decoded.add(datetime.date(2024, 2, 9), 'Bus', Decimal('-2.00'), -1)
+        self.assertEqual(RollupReport.decode(decoded.encode(), 'MONTHLY').as_dict(), decoded.as_dict())
+
+
+def post_expense(client):
+    return client.post('/add-expense/', {
+        'amount': '1.00',
+        'date': timezone.localdate().isoformat(),
+        'category_name': 'Others',
+    }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+
+class AddExpenseQueryTests(TestCase):
+    # The identity lookup, then a savepoint around the profile lock, expense
+    # insert, analytics read and update, profile counters and feed activity,
+    # and the leaderboard bucket upsert after commit.
+    QUERIES = 10
+    # Fan-out adds the follower lookup and the timeline insert.
+    FANOUT_QUERIES = 2
+
+    def test_logging_an_expense_is_a_fixed_number_of_queries(self):
+        user = User.objects.create(username='writer')
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            post_expense(self.client)
+        for fanout, queries in ((False, self.QUERIES), (True, self.QUERIES + self.FANOUT_QUERIES)):
+            with self.subTest(fanout=fanout), override_settings(ACTIVITY_FANOUT=fanout):
+                with self.assertNumQueries(queries), self.captureOnCommitCallbacks(execute=True):
+                    self.assertEqual(post_expense(self.client).status_code, 200)
+
+
+class ParallelLogTests(TransactionTestCase):
+    THREADS = 6
+    PER_THREAD = 4
+
+    def setUp(self):
+        super().setUp()
+        # An earlier TransactionTestCase may have flushed the catalog the migrations seed.
+        Achievement.populate_achievements()
+
+    def test_parallel_logs_step_the_streak_once(self):
+        user = User.objects.create(username='parallel')
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        UserProfile.objects.filter(user=user).update(streak_count=4, last_log_date=yesterday)
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker():
+            client = self.client_class()
+            client.force_login(user)
+            try:
+                barrier.wait()
+                for _ in range(self.PER_THREAD):
+                    response = post_expense(client)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        profile = UserProfile.objects.get(user=user)
+        logs = self.THREADS * self.PER_THREAD
+        self.assertEqual((profile.streak_count, profile.total_logs), (5, logs))
+        self.assertEqual(Expense.objects.filter(user=user).count(), logs)
+
+
+class IndexUsageTests(TestCase):
+    def assert_hot_queries_use_their_indexes(self):
+        for label, index, queryset in hot_queries():
+            with self.subTest(label):
+                self.assertIn(index, queryset.explain())
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "runs on the SQLite default database")
+    def test_sqlite_plans(self):
+        self.assert_hot_queries_use_their_indexes()
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', "needs a PostgreSQL DATABASE_URL")
+    def test_postgresql_plans(self):
+        with connection.cursor() as cursor:
+            # Small test tables would otherwise be planned as sequential scans.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assert_hot_queries_use_their_indexes()
+
+
+class AdminQueryTests(TestCase):
+    def test_admin_pages_do_not_grow_with_the_table(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        users = [User.objects.create(username=f'member-{n}') for n in range(5)]
+        self.client.force_login(admin)
+        seed(users, 20)
+        pages = admin_pages(users, Expense.objects.filter(user=users[0]).first())
+        before = {}
+        for label, url in pages:
+            # The first request warms per-process caches (content types, permissions).
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200, label)
+            before[label] = len(queries)
+            self.assertLessEqual(before[label], ADMIN_BUDGET, label)
+
+        seed(users, 200)
+        for label, url in pages:
+            with self.subTest(label), self.assertNumQueries(before[label]):
+                self.client.get(url)
+
+
+class FriendConsentTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+
+    def as_user(self, user, url, data=None):
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            if data is None:
+                return self.client.get(url).json()
+            return self.client.post(url, data).json()
+
+    def visible(self):
+        feed = self.as_user(self.reader, '/api/sync/feed/')['data']
+        board = self.as_user(self.reader, '/api/sync/leaderboard/?board=logs&scope=friends')['data']['entries']
+        return (
+            {item['user']['username'] for item in feed} - {'reader'},
+            {entry['user']['username'] for entry in board} - {'reader'},
+        )
+
+    def test_activity_and_scores_wait_for_acceptance(self):
+        for fanout in (True, False):
+            with self.subTest(fanout=fanout), override_settings(ACTIVITY_FANOUT=fanout):
+                self.as_user(self.reader, '/api/friends/', {'username': 'author'})
+                self.client.force_login(self.author)
+                with self.captureOnCommitCallbacks(execute=True):
+                    post_expense(self.client)
+                self.assertEqual(self.visible(), (set(), set()))
+                requests = self.as_user(self.author, '/api/friends/')['data']['requests']
+                self.assertEqual([request['username'] for request in requests], ['reader'])
+
+                self.as_user(self.author, '/api/friends/', {'username': 'reader', 'accept': 'on'})
+                self.assertEqual(self.visible(), ({'author'}, {'author'}))
+
+                self.as_user(self.author, '/api/friends/', {'username': 'reader', 'remove': 'on'})
+                self.assertEqual(self.visible(), (set(), set()))
+
+    def test_accepting_needs_a_request(self):
+        response = self.as_user(self.author, '/api/friends/', {'username': 'reader', 'accept': 'on'})
+        self.assertEqual(response['status'], 'error')
+
+
+class AchievementSeedTests(TestCase):
+    def catalog(self):
+        return set(Achievement.objects.values_list('key', 'name', 'description', 'icon'))
+
+    def test_migration_seeds_the_live_catalog(self):
+        seeded = self.catalog()
+        Achievement.populate_achievements()
+        self.assertEqual(seeded, self.catalog())
+        self.assertEqual({key for key, *_ in seeded}, set(Achievement.AchievementKeys.values))
+
+
+class IdentityCacheTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('member', password='first-password')
+        self.client.force_login(self.user)
+
+    def profile_status(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get('/api/sync/profile/').status_code
+
+    def test_cached_identity_leaves_out_the_password(self):
+        self.assertEqual(self.profile_status(), 200)
+        with self.assertNumQueries(0):
+            user = get_user(self.user.pk)
+        self.assertNotIn('password', user.__dict__)
+        self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+        self.assertEqual(self.profile_status(), 200)
+
+    def test_password_change_ends_the_session(self):
+        self.assertEqual(self.profile_status(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('second-password')
+            self.user.save()
+        self.assertEqual(self.profile_status(), 302)
+
+    async def test_async_profile_for_each_backend(self):
+        for backend in settings.AUTHENTICATION_BACKENDS:
+            with self.subTest(backend=backend):
+                await sync_to_async(caches['tiered'].clear)()
+                client = AsyncClient()
+                await client.aforce_login(self.user, backend=backend)
+                response = await client.get('/api/profile/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['data']['profile']['user_id'], self.user.pk)
+
+    def test_signup_logs_the_new_user_in(self):
+        self.client.logout()
+        response = self.client.post('/auth/', {
+            'signup_submit': '1', 'first_name': 'New', 'last_name': 'Member', 'email': 'new@example.com',
+            'password': 'a-long-password', 'confirm_password': 'a-long-password',
+        })
+        self.assertEqual(response.json(), {'success': True})
+        self.assertEqual(self.profile_status(), 200)
+
+    def test_bulk_deactivation_ends_the_session(self):
+        self.assertEqual(self.profile_status(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.profile_status(), 302)
+
+    def test_bulk_update_of_other_fields_leaves_the_cache_alone(self):
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            User.objects.filter(pk=self.user.pk).update(first_name='Renamed')
+        self.assertEqual(callbacks, [])
+
+
+class MonthCloseTests(TestCase):
+    MONTH = datetime.date(2024, 3, 1)
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='saver')
+        UserProfile.objects.filter(user=self.user).update(monthly_savings_goal=Decimal('100.00'))
+
+    def spend(self, amount, day=15):
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(
+                user=self.user, amount=Decimal(amount), category='Food', date=self.MONTH.replace(day=day),
+                currency=settings.BASE_CURRENCY,
+            )
+
+    def close(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return close_month(self.MONTH)
+
+    def outcome(self):
+        profile = UserProfile.objects.get(user=self.user)
+        statement = MonthlyStatement.objects.get(user=self.user, month=self.MONTH)
+        return statement.goal_met, profile.goals_met, profile.achievements.filter(key='GOAL_ACHIEVER').exists()
+
+    def test_idle_month_does_not_meet_the_goal(self):
+        self.close()
+        self.assertEqual(self.outcome(), (None, 0, False))
+        self.assertFalse(UserActivity.objects.filter(user=self.user, kind=UserActivity.Kind.ACHIEVEMENT).exists())
+
+    def test_late_expense_reopens_the_month(self):
+        self.spend('50.00')
+        self.close()
+        self.assertEqual(self.outcome(), (True, 1, True))
+
+        self.spend('80.00', day=20)
+        self.assertTrue(MonthlyStatement.objects.get(user=self.user, month=self.MONTH).stale)
+        month = history(self.user.pk, 1, self.MONTH.replace(day=31))[0]
+        self.assertEqual((month['closed'], month['total']), (False, '130.00'))
+
+        self.assertEqual(self.close()['statements'], 1)
+        statement = MonthlyStatement.objects.get(user=self.user, month=self.MONTH)
+        self.assertEqual((statement.stale, statement.total), (False, Decimal('130.00')))
+        self.assertEqual(self.outcome(), (False, 0, True))
+        # A run with nothing stale leaves the month alone.
+        self.assertEqual(self.close()['statements'], 0)
+
+
+@override_settings(BASE_CURRENCY='INR')
+class CurrencyMigrationTests(TransactionTestCase):
+    before = [('accounts', '0002_achievement_userprofile_useractivity'), ('budgetmanage', '0008_admin_indexes')]
+    after = [('budgetmanage', '0009_currency')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_existing_expenses_keep_their_owners_currency(self):
+        apps = self.migrate(self.before)
+        User, UserProfile = apps.get_model('accounts', 'User'), apps.get_model('accounts', 'UserProfile')
+        Expense = apps.get_model('budgetmanage', 'Expense')
+        for username, preferred in (('dollars', 'USD'), ('rupees', 'inr')):
+            user = User.objects.create(username=username)
+            UserProfile.objects.create(user=user, preferred_currency=preferred)
+            Expense.objects.create(user=user, amount=Decimal('12.50'), category='Food', date=datetime.date(2024, 1, 5))
+
+        apps = self.migrate(self.after)
+        Expense = apps.get_model('budgetmanage', 'Expense')
+        self.assertEqual(
+            set(Expense.objects.values_list('user__username', 'currency', 'base_amount')),
+            {('dollars', 'USD', Decimal('12.50')), ('rupees', 'INR', Decimal('12.50'))},
+        )
@@ -0,0 +1,129 @@
+import calendar
+import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+
+from .models import Expense
+from .recurrences import add_months
+
+DEFAULT_PERIODS = 12
+MOVING_AVERAGE_WINDOW = 3
+
+
+def bucket_starts(granularity, today, periods):
+    if granularity == 'week':
+        current = today - datetime.timedelta(days=today.weekday())
+        return [current - datetime.timedelta(weeks=n) for n in range(periods - 1, -1, -1)]
+    current = today.replace(day=1)
+    return [add_months(current, -n, 1) for n in range(periods - 1, -1, -1)]
+
+
+def elapsed_fraction(granularity, today):
+    if granularity == 'week':
+        return (today.weekday() + 1) / 7
+    return today.day / calendar.monthrange(today.year, today.month)[1]
+
+
+def daily_rows(user_id, start, today):
+    # Aggregate per day in SQL and fold days into buckets with NumPy: Trunc* runs as a
+    # per-row Python function on SQLite, while a plain date GROUP BY walks the
+    # (user, date) index and returns at most a few thousand rows.
+    return (
+        Expense.objects.filter(user_id=user_id, date__gte=start, date__lte=today)
+        .values_list('date')
+        .annotate(total=Sum('base_amount'))
+        .order_by()
+    )
+
+
+def category_rows(user_id, start, end):
+    return (
+        Expense.objects.filter(user_id=user_id, date__range=(start, end))
+        .values_list('category')
+        .annotate(total=Sum('base_amount'))
+        .order_by()
+    )
+
+
+def bucket_totals(rows, starts):
+    if not rows:
+        return np.zeros(len(starts))
+    days, amounts = zip(*rows)
+    day_numbers = np.array([day.toordinal() for day in days])
+    start_numbers = np.array([start.toordinal() for start in starts])
+    buckets = np.searchsorted(start_numbers, day_numbers, side='right') - 1
+    return np.bincount(buckets, weights=np.array(amounts, dtype=float), minlength=len(starts))
+
+
+def moving_average(values, window):
+    result = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        cumulative = np.cumsum(np.insert(values, 0, 0.0))
+        result[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return result
+
+
+def percent_change(values):
+    previous, delta = values[:-1], np.diff(values)
+    change = np.full(delta.shape, np.nan)
+    np.divide(delta, previous, out=change, where=previous != 0)
+    return delta, change * 100
+
+
+def linear_forecast(values):
+    # Fit the completed buckets only; the current one is still filling up.
+    completed = values[:-1]
+    if np.count_nonzero(completed) < 2:
+        return None
+    x = np.arange(len(completed))
+    slope, intercept = np.polyfit(x, completed, 1)
+    return round(max(0.0, float(slope * len(completed) + intercept)), 2)
+
+
+def _to_list(values):
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+
+def build_trends(granularity, today, starts, days, categories):
+    totals = bucket_totals(days, starts)
+    delta, change = percent_change(totals)
+
+    names = [name for name, _ in categories]
+    category_amounts = np.array([float(total) for _, total in categories])
+    window_total = category_amounts.sum()
+    shares = category_amounts / window_total * 100 if window_total else np.zeros(len(names))
+    order = np.argsort(-category_amounts, kind='stable')
+
+    return {
+        'granularity': granularity,
+        'currency': settings.BASE_CURRENCY,
+        'buckets': [start.isoformat() for start in starts],
+        'totals': _to_list(totals),
+        'moving_average': _to_list(moving_average(totals, MOVING_AVERAGE_WINDOW)),
+        'delta': [None] + _to_list(delta),
+        'change_pct': [None] + _to_list(change),
+        'categories': [
+            {'category': names[i], 'total': round(float(category_amounts[i]), 2), 'share': round(float(shares[i]), 1)}
+            for i in order
+        ],
+        'forecast': {
+            'next_bucket': linear_forecast(totals),
+            'current_projected': round(float(totals[-1] / elapsed_fraction(granularity, today)), 2),
+        },
+    }
+
+
+def compute_trends(user_id, granularity, today, periods=DEFAULT_PERIODS):
+    starts = bucket_starts(granularity, today, periods)
+    days = list(daily_rows(user_id, starts[0], today))
+    categories = list(category_rows(user_id, starts[0], today))
+    return build_trends(granularity, today, starts, days, categories)
+
+
+async def acompute_trends(user_id, granularity, today, periods=DEFAULT_PERIODS):
+    starts = bucket_starts(granularity, today, periods)
+    days = [row async for row in daily_rows(user_id, starts[0], today)]
+    categories = [row async for row in category_rows(user_id, starts[0], today)]
+    return build_trends(granularity, today, starts, days, categories)
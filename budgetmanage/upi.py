@@ -0,0 +1,164 @@
+import datetime
+import hashlib
+import re
+from decimal import Decimal, InvalidOperation
+from urllib.parse import parse_qs, urlsplit
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import achievements, rollups
+from .currency import CODE, RATES, CurrencyError, fill_base_amounts
+from .imports import CENT, MAX_AMOUNT, MAX_ERRORS
+from .models import Expense
+
+MAX_SCANS = 500
+VPA = re.compile(r'^[A-Za-z0-9.\-_]{2,256}@[A-Za-z][A-Za-z0-9.\-]{1,64}$')
+MAX_AGE = datetime.timedelta(days=365)
+
+
+class ScanError(ValueError):
+    pass
+
+
+def parse_amount(value):
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ScanError(f"Invalid amount {value!r}.")
+    if not amount.is_finite() or amount <= 0:
+        raise ScanError("The amount must be positive.")
+    if amount > MAX_AMOUNT:
+        raise ScanError("Amount is too large.")
+    return amount.quantize(CENT)
+
+
+def parse_payload(text):
+    """Parse a ``upi://pay?...`` QR payload into its payee, amount, currency and note.
+
+    Static merchant QR codes carry no amount; ``amount`` is None for those.
+    """
+    url = urlsplit(text.strip())
+    if url.scheme.lower() != 'upi' or url.netloc.lower() != 'pay':
+        raise ScanError("Not a UPI payment QR code.")
+    params = {key.lower(): values[0].strip() for key, values in parse_qs(url.query).items()}
+
+    payee_address = params.get('pa', '')
+    if not VPA.match(payee_address):
+        raise ScanError("Missing or invalid payee address.")
+    currency = params.get('cu', 'INR').upper()
+    if not CODE.match(currency):
+        raise ScanError(f"Invalid currency {currency!r}.")
+    return {
+        'payee_address': payee_address.lower(),
+        'payee_name': params.get('pn', '')[:100],
+        'amount': parse_amount(params['am']) if params.get('am') else None,
+        'currency': currency,
+        'note': params.get('tn', '')[:200],
+        'reference': params.get('tr', '')[:64],
+    }
+
+
+def scan_date(value, today):
+    if not value:
+        return today
+    try:
+        moment = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        raise ScanError(f"Invalid scanned_at {value!r}.")
+    day = timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+    if day > today or today - day > MAX_AGE:
+        raise ScanError("scanned_at is out of range.")
+    return day
+
+
+def scan_hash(payment, day, scan_id):
+    # The transaction reference identifies a payment. Without one, the client's scan
+    # id (or scan time) tells a re-sent copy of a scan from a second identical purchase.
+    if payment['reference']:
+        key = f"upi|{payment['payee_address']}|{payment['reference']}"
+    else:
+        key = f"upi|{payment['payee_address']}|{payment['amount']}|{day}|{payment['note']}|{scan_id}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def clean_scan(item, today):
+    if not isinstance(item, dict) or not isinstance(item.get('payload'), str):
+        raise ScanError("Each scan needs a payload string.")
+    payment = parse_payload(item['payload'])
+    if payment['amount'] is None:
+        if item.get('amount') in (None, ''):
+            raise ScanError("The QR code carries no amount; send the amount paid with the scan.")
+        payment['amount'] = parse_amount(item['amount'])
+    scan_id = item.get('id') or item.get('scanned_at') or ''
+    if not isinstance(scan_id, str) or len(scan_id) > 64:
+        raise ScanError("The scan id must be a string of at most 64 characters.")
+    day = scan_date(item.get('scanned_at'), today)
+    try:
+        RATES.rate(payment['currency'], day)
+    except CurrencyError as exc:
+        raise ScanError(str(exc))
+    name = payment['payee_name'] or payment['payee_address']
+    category = item.get('category') if isinstance(item.get('category'), str) else ''
+    return {
+        'date': day,
+        'amount': payment['amount'],
+        'currency': payment['currency'],
+        'category': (category.strip() or 'Others')[:30],
+        'description': f"UPI to {name}: {payment['note']}" if payment['note'] else f"UPI to {name}",
+        'import_hash': scan_hash(payment, day, scan_id),
+    }
+
+
+def ingest_scans(user, items, today=None):
+    """Turn a batch of scanned UPI payloads into expenses in one transaction.
+
+    Every item gets a status in ``results`` (created, duplicate or invalid), and
+    invalid items an entry in ``errors`` by index, so a client can clear what
+    was recorded after one round trip and show the user what was rejected.
+    """
+    today = today or timezone.localdate()
+    result = {'created': 0, 'duplicates': 0, 'invalid': 0, 'errors': [], 'results': []}
+    rows = {}
+    for index, item in enumerate(items):
+        try:
+            row = clean_scan(item, today)
+        except ScanError as exc:
+            result['invalid'] += 1
+            result['results'].append('invalid')
+            if len(result['errors']) < MAX_ERRORS:
+                result['errors'].append({'index': index, 'error': str(exc)})
+            continue
+        result['results'].append(row['import_hash'])
+        rows.setdefault(row['import_hash'], row)
+
+    with transaction.atomic():
+        # Holding the profile lock serializes syncs from the same user's devices,
+        # so the duplicate check below can't race another batch.
+        profile = achievements.locked_profile(user)
+        existing = set(
+            Expense.objects.filter(user=user, import_hash__in=list(rows)).values_list('import_hash', flat=True)
+        )
+        expenses = fill_base_amounts([Expense(user=user, **row) for key, row in rows.items() if key not in existing])
+        Expense.objects.bulk_create(expenses)
+        if expenses:
+            # bulk_create sends no post_save, so fold the rows into the rollups here.
+            rollups.apply_deltas(user.pk, [(e.date, e.category, e.base_amount, 1) for e in expenses], today)
+            result['achievements'] = achievements.record_logs(
+                profile, len(expenses), [e.category for e in expenses], today
+            )
+
+    created = {expense.import_hash for expense in expenses}
+    statuses = []
+    for key in result['results']:
+        if key in created:
+            statuses.append('created')
+            created.discard(key)
+        elif key != 'invalid':
+            statuses.append('duplicate')
+        else:
+            statuses.append(key)
+    result['results'] = statuses
+    result['created'] = statuses.count('created')
+    result['duplicates'] = statuses.count('duplicate')
+    return result
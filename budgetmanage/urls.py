@@ -3,7 +3,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from .views import index, dashboard, setting, profile, update_profile_view, addExpense, recurring, analytics
-from .views import qr_scanner
+from .views import qr_scanner, download_expenses_csv, import_expenses, dashboard_summary, analytics_trends
+from .views import cache_stats, changes, expense_list, profile_data, sync_upi_scans
+from .views import adashboard_summary, aanalytics_trends, aexpense_list, aprofile_data
+from .views import recurring_list, arecurring_list, search_expenses, asearch_expenses
+from .views import statement_history, astatement_history, activity_feed, aactivity_feed, friends
+from .views import leaderboard, aleaderboard
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', index, name="index"),
@@ -16,6 +21,31 @@ urlpatterns = [
     path('recurring/', recurring, name="recurring"),
     path('analytics/', analytics, name="analytics"),
     path('qr-scanner/', qr_scanner, name="qr-scanner"),
+    path('expenses/export/', download_expenses_csv, name="download-expenses-csv"),
+    path('expenses/import/', import_expenses, name="import-expenses"),
+    path('api/expenses/upi-sync/', sync_upi_scans, name="upi-sync"),
+    path('api/changes/', changes, name="changes"),
+    path('api/dashboard/summary/', adashboard_summary, name="dashboard-summary"),
+    path('api/analytics/trends/', aanalytics_trends, name="analytics-trends"),
+    path('api/expenses/', aexpense_list, name="expense-list"),
+    path('api/expenses/search/', asearch_expenses, name="expense-search"),
+    path('api/recurring/', arecurring_list, name="recurring-list"),
+    path('api/profile/', aprofile_data, name="profile-data"),
+    path('api/statements/', astatement_history, name="statement-history"),
+    path('api/feed/', aactivity_feed, name="activity-feed"),
+    path('api/friends/', friends, name="friends"),
+    path('api/leaderboard/', aleaderboard, name="leaderboard"),
+    # Sync twins of the read-only API, for WSGI deployments and load comparisons.
+    path('api/sync/dashboard/summary/', dashboard_summary, name="dashboard-summary-sync"),
+    path('api/sync/analytics/trends/', analytics_trends, name="analytics-trends-sync"),
+    path('api/sync/expenses/', expense_list, name="expense-list-sync"),
+    path('api/sync/expenses/search/', search_expenses, name="expense-search-sync"),
+    path('api/sync/recurring/', recurring_list, name="recurring-list-sync"),
+    path('api/sync/profile/', profile_data, name="profile-data-sync"),
+    path('api/sync/statements/', statement_history, name="statement-history-sync"),
+    path('api/sync/feed/', activity_feed, name="activity-feed-sync"),
+    path('api/sync/leaderboard/', leaderboard, name="leaderboard-sync"),
+    path('api/cache/stats/', cache_stats, name="cache-stats"),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -8,11 +8,29 @@ import requests
 import io
 from dotenv import load_dotenv
 import os
-import csv
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from .models import Expense
-from .forms import AddExpenseForm, RecurringExpenseForm
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from asgiref.sync import sync_to_async
+from functools import partial, wraps
+import hashlib
+from accounts.models import Achievement, User, UserProfile
+from .models import Expense, RecurringExpense
+from .forms import AddExpenseForm, RecurringExpenseForm, ExpenseExportForm, ExpenseImportForm, SummaryWindowForm, TrendForm
+from .forms import ChangesForm, ExpenseListForm, FeedForm, FriendForm, LeaderboardForm, RecurringListForm, SearchForm, StatementForm
+from . import achievements, caching, feed, leaderboards, rollups, search, statements, sync, trends
+from .reports import asummarize, summarize
+from .currency import BASE_CURRENCY, covers, preferred
+from .exports import expense_rows, encode_lines, gzip_stream
+from .imports import StatementError, import_statement, open_text
+from .upi import MAX_SCANS, ingest_scans
 
 env_path = settings.BASE_DIR / ".env"
 if env_path.exists():
@@ -41,8 +59,10 @@ def addExpense(request):
         else:
             form = AddExpenseForm(request.POST, user=request.user)
         if form.is_valid():
-            form.save()
-            request.user.profile.update_streak()
+            with transaction.atomic():
+                profile = achievements.locked_profile(request.user)
+                expense = form.save()
+                achievements.record_logs(profile, 1, [expense.category])
             return JsonResponse({'status': 'success', 'message': 'Expense added successfully.'})
         else:
             return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
@@ -59,7 +79,9 @@ def addExpense(request):
 def profile(request):
     if not request.user.is_authenticated:
         return redirect("/")
-    return render(request, 'profile.html', {"user": request.user})
+    # Only evaluated when the achievements fragment isn't cached for this generation.
+    achievement_summary = partial(achievements.badges, request.user.profile)
+    return render(request, 'profile.html', {"user": request.user, "achievement_summary": achievement_summary})
 
 @login_required
 def update_profile_view(request):
@@ -100,30 +122,404 @@ def analytics(request):
         return redirect("/")
     return render(request, 'analytics.html')
 
+def _analytics_version(request):
+    if not hasattr(request, '_analytics_version'):
+        version = rollups.last_updated(request.user.pk)
+        if version is None:
+            rollups.rebuild_user(request.user.pk)
+            version = rollups.last_updated(request.user.pk)
+        request._analytics_version = version
+    return request._analytics_version
+
+def analytics_last_modified(request):
+    return _analytics_version(request)
+
+def _analytics_etag(request, user_id, version):
+    # Relative windows ("this month") move with the calendar, so today is part of the key.
+    key = f"{user_id}:{version.isoformat()}:{timezone.localdate()}:{request.get_full_path()}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def analytics_etag(request):
+    return _analytics_etag(request, request.user.pk, _analytics_version(request))
+
+async def _aanalytics_version(request, user):
+    if not hasattr(request, '_analytics_version'):
+        version = await rollups.alast_updated(user.pk)
+        if version is None:
+            await sync_to_async(rollups.rebuild_user)(user.pk)
+            version = await rollups.alast_updated(user.pk)
+        request._analytics_version = version
+    return request._analytics_version
+
+def async_analytics_condition(view):
+    # condition() calls its validators synchronously, and they query the database.
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        version = await _aanalytics_version(request, user)
+        etag = quote_etag(_analytics_etag(request, user.pk, version))
+        last_modified = int(version.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+            response.headers.setdefault('ETag', etag)
+        return response
+    return wrapper
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=analytics_etag, last_modified_func=analytics_last_modified)
+def dashboard_summary(request):
+    form = SummaryWindowForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    start, end = form.window(timezone.localdate())
+    data = caching.cached_for_user(
+        request.user.pk,
+        f"summary:{start}:{end}",
+        lambda: summarize(request.user.pk, start, end),
+    )
+    return JsonResponse({'status': 'success', 'data': data})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=analytics_etag, last_modified_func=analytics_last_modified)
+def analytics_trends(request):
+    form = TrendForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    granularity = form.cleaned_data['granularity'] or 'month'
+    periods = form.cleaned_data['periods'] or trends.DEFAULT_PERIODS
+    today = timezone.localdate()
+    data = caching.cached_for_user(
+        request.user.pk,
+        f"trends:{granularity}:{periods}:{today}",
+        lambda: trends.compute_trends(request.user.pk, granularity, today, periods),
+    )
+    return JsonResponse({'status': 'success', 'data': data})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@async_analytics_condition
+async def adashboard_summary(request):
+    form = SummaryWindowForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    user = await request.auser()
+    start, end = form.window(timezone.localdate())
+    data = await caching.acached_for_user(
+        user.pk,
+        f"summary:{start}:{end}",
+        lambda: asummarize(user.pk, start, end),
+    )
+    return JsonResponse({'status': 'success', 'data': data})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@async_analytics_condition
+async def aanalytics_trends(request):
+    form = TrendForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    user = await request.auser()
+    granularity = form.cleaned_data['granularity'] or 'month'
+    periods = form.cleaned_data['periods'] or trends.DEFAULT_PERIODS
+    today = timezone.localdate()
+    data = await caching.acached_for_user(
+        user.pk,
+        f"trends:{granularity}:{periods}:{today}",
+        lambda: trends.acompute_trends(user.pk, granularity, today, periods),
+    )
+    return JsonResponse({'status': 'success', 'data': data})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=analytics_etag, last_modified_func=analytics_last_modified)
+def statement_history(request):
+    form = StatementForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    months = form.cleaned_data['months'] or form.MONTHS
+    today = timezone.localdate()
+    data = caching.cached_for_user(
+        request.user.pk,
+        f"statements:{months}:{today}",
+        lambda: statements.history(request.user.pk, months, today),
+    )
+    return JsonResponse({'status': 'success', 'data': data})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@async_analytics_condition
+async def astatement_history(request):
+    form = StatementForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    user = await request.auser()
+    months = form.cleaned_data['months'] or form.MONTHS
+    today = timezone.localdate()
+    data = await caching.acached_for_user(
+        user.pk,
+        f"statements:{months}:{today}",
+        lambda: sync_to_async(statements.history)(user.pk, months, today),
+    )
+    return JsonResponse({'status': 'success', 'data': data})
+
+def _expense_list(form, user_id):
+    return form.page(Expense.objects.filter(user_id=user_id))
+
+def _recurring_list(form, user_id):
+    return form.page(RecurringExpense.objects.filter(user_id=user_id))
+
+def _list_response(form, rows):
+    rows, next_cursor = form.next_page(rows)
+    return JsonResponse({'status': 'success', 'data': rows, 'next': next_cursor})
+
+@login_required
+def expense_list(request):
+    form = ExpenseListForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    return _list_response(form, list(_expense_list(form, request.user.pk)))
+
+@login_required
+async def aexpense_list(request):
+    form = ExpenseListForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    user = await request.auser()
+    return _list_response(form, [expense async for expense in _expense_list(form, user.pk)])
+
+@login_required
+def recurring_list(request):
+    form = RecurringListForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    return _list_response(form, list(_recurring_list(form, request.user.pk)))
+
+@login_required
+async def arecurring_list(request):
+    form = RecurringListForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    user = await request.auser()
+    return _list_response(form, [recurring async for recurring in _recurring_list(form, user.pk)])
+
+@login_required
+def search_expenses(request):
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    data = search.ranked(request.user.pk, form.cleaned_data['q'], form.cleaned_data['limit'] or 20)
+    return JsonResponse({'status': 'success', 'data': data})
+
+@login_required
+async def asearch_expenses(request):
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    user = await request.auser()
+    data = await sync_to_async(search.ranked)(user.pk, form.cleaned_data['q'], form.cleaned_data['limit'] or 20)
+    return JsonResponse({'status': 'success', 'data': data})
+
+def _earned_achievements(user_id):
+    return Achievement.objects.filter(userprofile__user_id=user_id).values('key', 'name', 'description', 'icon')
+
+def _profile_data(user, earned):
+    data = user.to_dict()
+    data['profile'].update({
+        'total_logs': user.profile.total_logs,
+        'categories_used': user.profile.categories_used,
+        'achievements': earned,
+    })
+    return data
+
+@login_required
+def profile_data(request):
+    user = request.user
+    data = caching.cached_for_user(
+        user.pk,
+        'profile-data',
+        lambda: _profile_data(user, list(_earned_achievements(user.pk))),
+    )
+    return JsonResponse({'status': 'success', 'data': data})
+
+@login_required
+async def aprofile_data(request):
+    user = await request.auser()
+
+    async def load():
+        if not User.profile.is_cached(user):
+            # Sessions from the plain ModelBackend come without the profile attached.
+            user.profile = await UserProfile.objects.aget(user_id=user.pk)
+        return _profile_data(user, [achievement async for achievement in _earned_achievements(user.pk)])
+
+    data = await caching.acached_for_user(user.pk, 'profile-data', load)
+    return JsonResponse({'status': 'success', 'data': data})
+
+@staff_member_required
+def cache_stats(request):
+    # Counters are per worker process.
+    return JsonResponse({'status': 'success', 'data': caching.stats()})
+
 @login_required
 def download_expenses_csv(request):
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="expenses.csv"'},
+    form = ExpenseExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+
+    expenses = form.filter(Expense.objects.filter(user=request.user))
+    currency = preferred(request.user)
+    first = expenses.order_by('date').values_list('date', flat=True).first()
+    if first is not None and not covers(currency, first):
+        currency = BASE_CURRENCY
+    stream = encode_lines(expense_rows(expenses, currency))
+
+    filename = 'expenses.csv'
+    content_type = 'text/csv; charset=utf-8'
+    if form.cleaned_data['compress'] == 'gzip':
+        stream = gzip_stream(stream)
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    return StreamingHttpResponse(
+        stream,
+        content_type=content_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@login_required
+def import_expenses(request):
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'error': 'Invalid request'}, status=400)
+
+    form = ExpenseImportForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+
+    try:
+        result = import_statement(
+            request.user,
+            open_text(form.cleaned_data['statement'].file),
+            fmt=form.statement_format(),
+        )
+    except StatementError as e:
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+
+    return JsonResponse({'status': 'success', 'data': result})
+
+@login_required
+def changes(request):
+    if request.method == 'POST':
+        try:
+            items = json.loads(request.body)['changes']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'status': 'error', 'error': 'Expected a JSON body with a "changes" list.'}, status=400)
+        if not isinstance(items, list) or len(items) > sync.MAX_CHANGES:
+            return JsonResponse(
+                {'status': 'error', 'error': f'"changes" must be a list of at most {sync.MAX_CHANGES} items.'},
+                status=400,
+            )
+        return JsonResponse({'status': 'success', 'data': sync.apply_changes(request.user, items)})
+
+    form = ChangesForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    try:
+        data = sync.changes_since(
+            request.user, form.cleaned_data['cursor'], form.cleaned_data['limit'] or sync.PAGE_SIZE
+        )
+    except sync.CursorExpired as e:
+        return JsonResponse({'status': 'error', 'error': str(e), 'reset': True}, status=410)
+    except sync.SyncError as e:
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+    return JsonResponse({'status': 'success', 'data': data})
+
+def _feed_page(form, user):
+    cursor = feed.decode_cursor(form.cleaned_data['cursor']) if form.cleaned_data['cursor'] else None
+    return feed.page(user, cursor, form.cleaned_data['limit'] or feed.PAGE_SIZE)
+
+@login_required
+def activity_feed(request):
+    form = FeedForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    try:
+        items, next_cursor = _feed_page(form, request.user)
+    except feed.FeedError as e:
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+    return JsonResponse({'status': 'success', 'data': items, 'next': next_cursor})
+
+@login_required
+async def aactivity_feed(request):
+    form = FeedForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    user = await request.auser()
+    try:
+        items, next_cursor = await sync_to_async(_feed_page)(form, user)
+    except feed.FeedError as e:
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+    return JsonResponse({'status': 'success', 'data': items, 'next': next_cursor})
+
+@login_required
+def friends(request):
+    if request.method == 'POST':
+        form = FriendForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+        try:
+            with transaction.atomic():
+                if form.cleaned_data['remove']:
+                    feed.unfollow(request.user, form.cleaned_data['username'])
+                elif form.cleaned_data['accept']:
+                    feed.accept(request.user, form.cleaned_data['username'])
+                else:
+                    feed.follow(request.user, form.cleaned_data['username'])
+        except feed.FeedError as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+    return JsonResponse({'status': 'success', 'data': feed.friends(request.user)})
+
+def _leaderboard(form, user):
+    return leaderboards.standings(
+        user, form.cleaned_data['board'], form.cleaned_data['scope'] or 'friends', form.cleaned_data['limit'] or form.LIMIT,
     )
 
-    writer = csv.writer(response)
-    writer.writerow(['Date', 'Category', 'Amount', 'Currency', 'Description'])
+@login_required
+def leaderboard(request):
+    form = LeaderboardForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    return JsonResponse({'status': 'success', 'data': _leaderboard(form, request.user)})
+
+@login_required
+async def aleaderboard(request):
+    form = LeaderboardForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    user = await request.auser()
+    data = await sync_to_async(_leaderboard)(form, user)
+    return JsonResponse({'status': 'success', 'data': data})
 
-    expenses = Expense.objects.filter(user=request.user).order_by('date')
-    currency = request.user.profile.preferred_currency
+@login_required
+def sync_upi_scans(request):
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'error': 'Invalid request'}, status=400)
 
-    for expense in expenses:
-        writer.writerow([
-            expense.date, 
-            expense.category.name if expense.category else 'N/A', 
-            expense.amount, 
-            currency,
-            expense.description
-        ])
+    try:
+        scans = json.loads(request.body)['scans']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'status': 'error', 'error': 'Expected a JSON body with a "scans" list.'}, status=400)
+    if not isinstance(scans, list):
+        return JsonResponse({'status': 'error', 'error': '"scans" must be a list.'}, status=400)
+    if len(scans) > MAX_SCANS:
+        return JsonResponse({'status': 'error', 'error': f'Send at most {MAX_SCANS} scans per request.'}, status=400)
 
-    return response
+    return JsonResponse({'status': 'success', 'data': ingest_scans(request.user, scans)})
 
 @login_required
+@ensure_csrf_cookie
 def qr_scanner(request):
     return render(request, 'qr-scanner.html')
\ No newline at end of file
@@ -6,5 +6,6 @@ pip install -r requirements.txt
 python manage.py makemigrations
 python manage.py migrate
 
+python manage.py build_assets --quiet-report
 python manage.py collectstatic --noinput
 python manage.py createsuperuser --noinput
\ No newline at end of file
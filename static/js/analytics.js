@@ -9,6 +9,43 @@ class AnalyticsManager {
         this.initCharts();
         this.bindEvents();
         this.loadInsights();
+        this.refreshSummary('month');
+        this.updateTrendChart('month');
+    }
+
+    async fetchSummary(period) {
+        // The server answers repeat polls with 304 via ETag, so this is cheap to call.
+        const response = await fetch(`/api/dashboard/summary/?period=${period}`, {
+            headers: { 'X-Requested-With': 'XMLHttpRequest' },
+            credentials: 'same-origin'
+        });
+        if (!response.ok) return null;
+        const payload = await response.json();
+        return payload.data;
+    }
+
+    async refreshSummary(period) {
+        const summary = await this.fetchSummary(period).catch(() => null);
+        if (!summary) return;
+
+        this.data.categories = {};
+        summary.categories.forEach(row => {
+            this.data.categories[row.category.toLowerCase()] = parseFloat(row.total);
+        });
+        this.data.recurring = parseFloat(summary.recurring);
+        this.data.oneTime = parseFloat(summary.one_time);
+
+        if (this.charts.category) {
+            this.charts.category.data.labels = Object.keys(this.data.categories).map(cat =>
+                cat.charAt(0).toUpperCase() + cat.slice(1)
+            );
+            this.charts.category.data.datasets[0].data = Object.values(this.data.categories);
+            this.charts.category.update('active');
+        }
+        if (this.charts.comparison) {
+            this.charts.comparison.data.datasets[0].data = [this.data.recurring, this.data.oneTime];
+            this.charts.comparison.update('active');
+        }
     }
 
     loadData() {
@@ -266,37 +303,28 @@ class AnalyticsManager {
 
     updateCategoryChart(period) {
         if (!this.charts.category) return;
-
-        // Mock data update based on period
-        let multiplier = 1;
-        switch (period) {
-            case 'week':
-                multiplier = 0.25;
-                break;
-            case 'year':
-                multiplier = 12;
-                break;
-        }
-
-        const newData = Object.values(this.data.categories).map(val => 
-            Math.round(val * multiplier)
-        );
-
-        this.charts.category.data.datasets[0].data = newData;
-        this.charts.category.update('active');
+        this.refreshSummary(period);
     }
 
-    updateTrendChart(period) {
+    async updateTrendChart(period) {
         if (!this.charts.trend) return;
 
-        if (period === 'week') {
-            this.charts.trend.data.labels = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'];
-            this.charts.trend.data.datasets[0].data = this.data.trends.weekly;
-        } else {
-            this.charts.trend.data.labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'];
-            this.charts.trend.data.datasets[0].data = this.data.trends.monthly;
-        }
+        const granularity = period === 'week' ? 'week' : 'month';
+        const response = await fetch(`/api/analytics/trends/?granularity=${granularity}&periods=${granularity === 'week' ? 7 : 6}`, {
+            headers: { 'X-Requested-With': 'XMLHttpRequest' },
+            credentials: 'same-origin'
+        }).catch(() => null);
+        if (!response || !response.ok) return;
+        const trends = (await response.json()).data;
 
+        const format = granularity === 'week'
+            ? { month: 'short', day: 'numeric' }
+            : { month: 'short' };
+        this.charts.trend.data.labels = trends.buckets.map(bucket =>
+            new Date(`${bucket}T00:00:00`).toLocaleDateString('en-US', format)
+        );
+        this.charts.trend.data.datasets[0].data = trends.totals;
+        this.data.trends[granularity === 'week' ? 'weekly' : 'monthly'] = trends.totals;
         this.charts.trend.update('active');
     }
 
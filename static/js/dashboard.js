@@ -11,6 +11,22 @@ class DashboardManager {
         this.initChart();
         this.bindEvents();
         this.animateCounters();
+        this.loadSummary();
+    }
+
+    async loadSummary() {
+        try {
+            const response = await fetch('/api/dashboard/summary/?period=month', {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' },
+                credentials: 'same-origin'
+            });
+            if (!response.ok) return;
+            const payload = await response.json();
+            this.data.currentSpend = parseFloat(payload.data.total);
+            this.updateQuickStats();
+        } catch (error) {
+            console.error('Could not load dashboard summary:', error);
+        }
     }
 
     loadData() {
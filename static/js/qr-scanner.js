@@ -5,6 +5,8 @@ class QRScannerManager {
         this.hasCamera = false;
         this.selectedApp = null;
         this.scanHistory = this.loadScanHistory();
+        this.currentScan = null;
+        this.isSyncing = false;
         this.init();
     }
 
@@ -13,6 +15,8 @@ class QRScannerManager {
         this.bindEvents();
         this.updateScanCount();
         this.renderHistory();
+        this.syncQueue();
+        window.addEventListener('online', () => this.syncQueue());
     }
 
     async checkCameraSupport() {
@@ -416,7 +420,8 @@ class QRScannerManager {
     showUPIModal(scanData) {
         const modal = document.getElementById('upi-modal');
         const detailsContainer = document.getElementById('payment-details');
-        
+        this.currentScan = scanData;
+
         // Populate payment details
         let detailsHTML = '';
         Object.entries(scanData.fields).forEach(([key, value]) => {
@@ -434,6 +439,16 @@ class QRScannerManager {
             }
         });
 
+        // Static merchant QR codes carry no amount; ask for what was paid.
+        if (!scanData.fields.amount || scanData.fields.amount === '0') {
+            detailsHTML += `
+                <div class="payment-field">
+                    <label class="payment-label" for="upi-amount">Amount paid (₹)</label>
+                    <input type="number" id="upi-amount" class="payment-value" step="0.01" min="0.01" placeholder="0.00">
+                </div>
+            `;
+        }
+
         detailsContainer.innerHTML = detailsHTML;
 
         // Reset app selection
@@ -464,6 +479,17 @@ class QRScannerManager {
     proceedToPayment() {
         if (!this.selectedApp) return;
 
+        const amountInput = document.getElementById('upi-amount');
+        if (amountInput) {
+            const amount = parseFloat(amountInput.value);
+            if (!(amount > 0)) {
+                this.showError('Enter the amount you paid');
+                amountInput.focus();
+                return;
+            }
+            this.currentScan.enteredAmount = amount.toFixed(2);
+        }
+
         const appNames = {
             gpay: 'Google Pay',
             phonepe: 'PhonePe',
@@ -473,6 +499,7 @@ class QRScannerManager {
 
         // Simulate opening UPI app
         this.showSuccess(`Opening ${appNames[this.selectedApp]}...`);
+        this.queuePayment(this.currentScan);
         
         // Close modal after a delay
         setTimeout(() => {
@@ -481,6 +508,104 @@ class QRScannerManager {
         }, 1500);
     }
 
+    queuePayment(scanData) {
+        if (!scanData || !scanData.rawData) return;
+        const queue = this.loadSyncQueue();
+        const scan = {
+            id: window.crypto?.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`,
+            payload: scanData.rawData,
+            scanned_at: scanData.timestamp
+        };
+        if (scanData.enteredAmount) scan.amount = scanData.enteredAmount;
+        queue.push(scan);
+        this.saveSyncQueue(queue);
+        this.syncQueue();
+    }
+
+    // Payments are recorded as expenses in batches: every queued scan goes up in
+    // one request, so scans made offline sync in a single round trip.
+    async syncQueue() {
+        const queue = this.loadSyncQueue();
+        if (this.isSyncing || queue.length === 0 || !navigator.onLine) return;
+
+        this.isSyncing = true;
+        try {
+            const response = await fetch('/api/expenses/upi-sync/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': this.getCookie('csrftoken')
+                },
+                body: JSON.stringify({ scans: queue.slice(0, 500) })
+            });
+            if (!response.ok) return;
+
+            const result = await response.json();
+            if (result.status !== 'success') return;
+            // Scans queued while the request was in flight stay for the next sync.
+            const sent = result.data.results.length;
+            this.saveSyncQueue(this.loadSyncQueue().slice(sent));
+            if (result.data.created > 0) {
+                this.showSuccess(`Recorded ${result.data.created} payment${result.data.created === 1 ? '' : 's'} as expenses`);
+            }
+            if (result.data.invalid > 0) {
+                this.keepRejected(queue.slice(0, sent), result.data);
+            }
+        } catch (error) {
+            console.error('Failed to sync payments:', error);
+        } finally {
+            this.isSyncing = false;
+        }
+    }
+
+    // Rejected scans are kept, with the reason, instead of vanishing from the queue.
+    keepRejected(sent, data) {
+        const reasons = Object.fromEntries(data.errors.map(error => [error.index, error.error]));
+        const rejected = sent
+            .map((scan, index) => ({ ...scan, error: reasons[index] || 'Rejected by the server' }))
+            .filter((scan, index) => data.results[index] === 'invalid');
+        try {
+            const saved = JSON.parse(localStorage.getItem('upiRejectedScans') || '[]');
+            localStorage.setItem('upiRejectedScans', JSON.stringify(saved.concat(rejected).slice(-100)));
+        } catch (error) {
+            console.error('Failed to save rejected scans:', error);
+        }
+        const count = rejected.length;
+        this.showError(`${count} payment${count === 1 ? " wasn't" : "s weren't"} recorded: ${rejected[0].error}`);
+    }
+
+    loadSyncQueue() {
+        try {
+            const saved = localStorage.getItem('upiSyncQueue');
+            return saved ? JSON.parse(saved) : [];
+        } catch (error) {
+            return [];
+        }
+    }
+
+    saveSyncQueue(queue) {
+        try {
+            localStorage.setItem('upiSyncQueue', JSON.stringify(queue));
+        } catch (error) {
+            console.error('Failed to save sync queue:', error);
+        }
+    }
+
+    getCookie(name) {
+        let cookieValue = null;
+        if (document.cookie && document.cookie !== '') {
+            const cookies = document.cookie.split(';');
+            for (let cookie of cookies) {
+                cookie = cookie.trim();
+                if (cookie.startsWith(name + '=')) {
+                    cookieValue = decodeURIComponent(cookie.slice(name.length + 1));
+                    break;
+                }
+            }
+        }
+        return cookieValue;
+    }
+
     closeModal() {
         const modal = document.getElementById('upi-modal');
         modal.classList.remove('active');
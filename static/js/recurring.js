@@ -1,115 +1,83 @@
 class RecurringExpensesManager {
     constructor() {
-        this.data = this.loadData();
+        this.data = { recurring: [], oneTime: [] };
         this.init();
     }
 
-    init() {
+    async init() {
         this.renderExpenses();
         this.bindEvents();
         this.calculateTotals();
+
+        await this.loadData();
+        this.renderExpenses();
+        this.calculateTotals();
+        this.addHoverEffects();
     }
 
-    loadData() {
-        return {
-            recurring: [
-                {
-                    id: 1,
-                    name: 'Rent',
-                    amount: 450,
-                    category: 'bills',
-                    frequency: 'monthly',
-                    nextDate: '2025-01-01',
-                    icon: 'fa-home'
-                },
-                {
-                    id: 2,
-                    name: 'Bus Pass',
-                    amount: 75,
-                    category: 'transport',
-                    frequency: 'monthly',
-                    nextDate: '2025-01-05',
-                    icon: 'fa-bus'
-                },
-                {
-                    id: 3,
-                    name: 'Spotify Premium',
-                    amount: 9.99,
-                    category: 'entertainment',
-                    frequency: 'monthly',
-                    nextDate: '2025-01-15',
-                    icon: 'fa-music'
-                },
-                {
-                    id: 4,
-                    name: 'Gym Membership',
-                    amount: 29,
-                    category: 'health',
-                    frequency: 'monthly',
-                    nextDate: '2025-01-20',
-                    icon: 'fa-dumbbell'
-                },
-                {
-                    id: 5,
-                    name: 'Internet',
-                    amount: 45,
-                    category: 'bills',
-                    frequency: 'monthly',
-                    nextDate: '2025-01-25',
-                    icon: 'fa-wifi'
-                }
-            ],
-            oneTime: [
-                {
-                    id: 1,
-                    name: 'Textbook: Advanced Mathematics',
-                    amount: 120,
-                    category: 'education',
-                    date: '2024-12-20',
-                    icon: 'fa-book'
-                },
-                {
-                    id: 2,
-                    name: 'Winter Jacket',
-                    amount: 85,
-                    category: 'shopping',
-                    date: '2024-12-18',
-                    icon: 'fa-tshirt'
-                },
-                {
-                    id: 3,
-                    name: 'Movie Night with Friends',
-                    amount: 45,
-                    category: 'entertainment',
-                    date: '2024-12-15',
-                    icon: 'fa-film'
-                },
-                {
-                    id: 4,
-                    name: 'Birthday Dinner',
-                    amount: 68,
-                    category: 'food',
-                    date: '2024-12-12',
-                    icon: 'fa-birthday-cake'
-                },
-                {
-                    id: 5,
-                    name: 'Prescription Medication',
-                    amount: 35,
-                    category: 'health',
-                    date: '2024-12-10',
-                    icon: 'fa-pills'
-                },
-                {
-                    id: 6,
-                    name: 'Gas for Road Trip',
-                    amount: 32,
-                    category: 'transport',
-                    date: '2024-12-08',
-                    icon: 'fa-gas-pump'
-                }
-            ]
-        };
+    async loadData() {
+        try {
+            const [recurring, expenses] = await Promise.all([
+                this.fetchList('/api/recurring/?limit=50&fields=category,amount,description,frequency,end_date'),
+                this.fetchList('/api/expenses/?limit=50&fields=category,amount,description,recurring_id')
+            ]);
+
+            this.data.recurring = recurring.map(expense => ({
+                id: expense.id,
+                name: expense.description || expense.category,
+                amount: parseFloat(expense.amount),
+                category: expense.category.toLowerCase(),
+                frequency: expense.frequency.toLowerCase(),
+                nextDate: this.nextDate(expense),
+                icon: this.getCategoryIcon(expense.category.toLowerCase())
+            }));
+            this.data.oneTime = expenses
+                .filter(expense => expense.recurring_id === null)
+                .map(expense => ({
+                    id: expense.id,
+                    name: expense.description || expense.category,
+                    amount: parseFloat(expense.amount),
+                    category: expense.category.toLowerCase(),
+                    date: expense.date,
+                    icon: this.getCategoryIcon(expense.category.toLowerCase())
+                }));
+        } catch (error) {
+            console.error('Failed to load expenses:', error);
+            this.showNotification('Could not load your expenses', 'info');
+        }
+    }
+
+    async fetchList(url) {
+        const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+        if (!response.ok) {
+            throw new Error(`${url} returned ${response.status}`);
+        }
+        const result = await response.json();
+        return result.data;
+    }
+
+    nextDate(expense) {
+        const [year, month, day] = expense.start_date.split('-').map(Number);
+        const today = new Date();
+        today.setHours(0, 0, 0, 0);
+
+        for (let n = 0; ; n++) {
+            let date;
+            if (expense.frequency === 'DAILY' || expense.frequency === 'WEEKLY') {
+                date = new Date(year, month - 1, day + n * (expense.frequency === 'DAILY' ? 1 : 7));
+            } else {
+                // Clamp to the month's last day, as the server does for the 31st.
+                const months = n * (expense.frequency === 'MONTHLY' ? 1 : 12);
+                const lastDay = new Date(year, month + months, 0).getDate();
+                date = new Date(year, month - 1 + months, Math.min(day, lastDay));
+            }
+            if (expense.end_date && date > new Date(`${expense.end_date}T00:00:00`)) {
+                return null;
+            }
+            if (date >= today) {
+                return date;
+            }
+        }
     }
 
     renderExpenses() {
@@ -130,7 +98,7 @@ class RecurringExpensesManager {
                     <h4>${expense.name}</h4>
                     <div class="expense-meta">
                         <span class="frequency">${this.capitalize(expense.frequency)}</span>
-                        <span class="next-date">Next: ${this.formatDate(expense.nextDate)}</span>
+                        <span class="next-date">${expense.nextDate ? `Next: ${this.formatDate(expense.nextDate)}` : 'Ended'}</span>
                     </div>
                 </div>
                 <div class="expense-actions">
@@ -1,63 +0,0 @@
-class ThemeManager {
-    constructor() {
-        this.theme = localStorage.getItem('theme') || 'light';
-        this.init();
-    }
-
-    init() {
-        this.applyTheme();
-        this.bindEvents();
-    }
-
-    applyTheme() {
-        document.documentElement.setAttribute('data-theme', this.theme);
-        this.updateThemeIcon();
-    }
-
-    updateThemeIcon() {
-        const themeBtn = document.getElementById('theme-toggle');
-        if (!themeBtn) return;
-
-        const icon = themeBtn.querySelector('i');
-        if (this.theme === 'dark') {
-            icon.className = 'fas fa-sun';
-        } else {
-            icon.className = 'fas fa-moon';
-        }
-    }
-
-    toggleTheme() {
-        this.theme = this.theme === 'light' ? 'dark' : 'light';
-        localStorage.setItem('theme', this.theme);
-        this.applyTheme();
-
-        // Animate transition
-        document.body.style.transition = 'all 0.3s ease';
-        setTimeout(() => {
-            document.body.style.transition = '';
-        }, 300);
-    }
-
-    bindEvents() {
-        const themeBtn = document.getElementById('theme-toggle');
-        if (themeBtn) {
-            themeBtn.addEventListener('click', () => {
-                this.toggleTheme();
-            });
-        }
-
-        if (window.matchMedia) {
-            const mediaQuery = window.matchMedia('(prefers-color-scheme: dark)');
-            mediaQuery.addListener(() => {
-                if (!localStorage.getItem('theme')) {
-                    this.theme = mediaQuery.matches ? 'dark' : 'light';
-                    this.applyTheme();
-                }
-            });
-        }
-    }
-}
-
-document.addEventListener('DOMContentLoaded', () => {
-    new ThemeManager();
-});